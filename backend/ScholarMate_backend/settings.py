@@ -14,6 +14,8 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", "your-default-secret-key-for-dev")
 DEBUG = os.environ.get("DJANGO_DEBUG", "True") == "True"
+# 추천 단계별 장학금 수(COUNT(*) 추가 조회) 디버그 로그. DEBUG 기본값이 True라 별도로 켤 때만 실행합니다.
+RECOMMENDATION_DEBUG_COUNTS = DEBUG and os.environ.get("RECOMMENDATION_DEBUG_COUNTS", "False") == "True"
 ALLOWED_HOSTS = os.environ.get(
     "DJANGO_ALLOWED_HOSTS", "127.0.0.1,localhost,34.228.112.95"
 ).split(",")
@@ -205,6 +207,14 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     print("WARNING: OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
 
+# 추천 사유 작성 모델(Batch/묶음 경로)과 실시간 추천 순위 모델 (순위 모델은 OpenAI 호환 로컬 서버(vLLM 등)로도 돌릴 수 있음)
+OPENAI_RECOMMENDATION_MODEL = os.environ.get("OPENAI_RECOMMENDATION_MODEL", "gpt-4o")
+OPENAI_RANKING_MODEL = os.environ.get("OPENAI_RANKING_MODEL", "gpt-4o-mini")
+OPENAI_RANKING_API_BASE = os.environ.get("OPENAI_RANKING_API_BASE") or None  # 예: http://localhost:8001/v1
+# 순위 서버 전용 키입니다. api_base를 바꾼 경우 기본 OPENAI_API_KEY가 그 서버로 전송되지 않도록 이 값만 보냅니다.
+# (지정하지 않으면 vLLM 기본값인 'EMPTY'를 보내고, api_base가 없으면 None이라 기본 OpenAI 키를 씁니다.)
+OPENAI_RANKING_API_KEY = os.environ.get("OPENAI_RANKING_API_KEY") or ("EMPTY" if OPENAI_RANKING_API_BASE else None)
+
 SERVICE_KEY = os.environ.get("SERVICE_KEY")
 if not SERVICE_KEY:
     print("WARNING: SERVICE_KEY 환경 변수가 설정되지 않았습니다.")
@@ -217,5 +227,25 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Seoul"
 
+# ===== Logging =====
+# 추천 모듈의 단계별 디버그 로그는 DEBUG일 때만 출력합니다. (운영에서는 로그 문자열 포맷팅/COUNT(*)도 실행되지 않음)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "scholarships.recommendation": {
+            "handlers": ["console"],
+            "level": "DEBUG" if DEBUG else "WARNING",
+            "propagate": False,
+        },
+        "scholarships.recommendation.counts": {
+            "level": "DEBUG" if RECOMMENDATION_DEBUG_COUNTS else "INFO",
+        },
+    },
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -1,6 +1,6 @@
 # scholarships/admin.py
 from django.contrib import admin
-from .models import Scholarship # Scholarship 모델 임포트 확인
+from .models import Scholarship, Recommendation # Scholarship 모델 임포트 확인
 
 class ScholarshipAdmin(admin.ModelAdmin):
     list_display = (
@@ -60,3 +60,12 @@ class ScholarshipAdmin(admin.ModelAdmin):
     )
 
 admin.site.register(Scholarship, ScholarshipAdmin)
+
+
+class RecommendationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'rank', 'scholarship', 'batch_id', 'created_at')
+    list_filter = ('batch_id', 'created_at')
+    search_fields = ('user__username', 'scholarship__name', 'scholarship__product_id')
+    raw_id_fields = ('user', 'scholarship')
+
+admin.site.register(Recommendation, RecommendationAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ScholarshipsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scholarships'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (시그널 수신기 등록)
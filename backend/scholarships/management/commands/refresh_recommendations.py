@@ -0,0 +1,54 @@
+# scholarships/management/commands/refresh_recommendations.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from userinfor.models import UserScholarship
+from scholarships.recommendation import (
+    recommend_batch_submit, recommend_batch_collect, BATCH_API_FINAL_STATUSES, BATCH_NO_OUTPUT_STATUS,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "OpenAI Batch API로 전체 사용자의 장학금 추천을 갱신합니다. "
+        "(submit: 제출, collect <batch_id>: 결과 수집, --wait: 완료될 때까지 상태를 확인하며 대기)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["submit", "collect"])
+        parser.add_argument("batch_id", nargs="?", help="collect 시 수집할 batch_id")
+        parser.add_argument("--wait", action="store_true", help="Batch가 끝날 때까지 기다렸다가 결과를 수집합니다.")
+        parser.add_argument("--poll-interval", type=int, default=60, help="--wait 사용 시 상태 확인 간격(초)")
+
+    def handle(self, *args, **options):
+        if options["action"] == "submit":
+            user_ids = list(UserScholarship.objects.values_list("user_id", flat=True))
+            self.stdout.write(f"총 {len(user_ids)}명의 추천 요청을 Batch API에 제출합니다.")
+            batch_id = recommend_batch_submit(user_ids)
+            if not batch_id:
+                self.stdout.write(self.style.WARNING("제출할 추천 요청이 없습니다."))
+                return
+            self.stdout.write(self.style.SUCCESS(f"✅ 제출 완료: batch_id={batch_id}"))
+            if not options["wait"]:
+                return
+        else:
+            batch_id = options["batch_id"]
+            if not batch_id:
+                raise CommandError("collect에는 batch_id가 필요합니다.")
+
+        batch_status = recommend_batch_collect(batch_id)
+        while options["wait"] and batch_status not in BATCH_API_FINAL_STATUSES:
+            self.stdout.write(f"대기 중... 현재 상태: {batch_status} ({options['poll_interval']}초 후 다시 확인)")
+            time.sleep(options["poll_interval"])
+            batch_status = recommend_batch_collect(batch_id)
+
+        if batch_status == "completed":
+            self.stdout.write(self.style.SUCCESS(f"✅ 추천 결과 저장 완료: batch_id={batch_id}"))
+        elif batch_status == BATCH_NO_OUTPUT_STATUS:
+            # 실패는 CommandError로 알려 cron 등에서 0이 아닌 종료 코드로 감지할 수 있게 합니다.
+            raise CommandError(
+                f"Batch는 완료되었지만 모든 요청이 실패해 저장할 결과가 없습니다. (batch_id={batch_id}, 오류 파일은 로그 참고)"
+            )
+        elif batch_status in BATCH_API_FINAL_STATUSES:
+            raise CommandError(f"Batch가 완료되지 못하고 종료되었습니다. 상태: {batch_status}")
+        else:
+            self.stdout.write(self.style.WARNING(f"아직 완료되지 않았습니다. 현재 상태: {batch_status}"))
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-14 15:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scholarships', '0011_rawscholarship_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='추천 순위')),
+                ('reason', models.TextField(blank=True, verbose_name='추천 사유')),
+                ('batch_id', models.CharField(blank=True, max_length=100, verbose_name='배치 ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='생성일')),
+                ('scholarship', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scholarships.scholarship', verbose_name='장학금')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scholarship_recommendations', to=settings.AUTH_USER_MODEL, verbose_name='사용자')),
+            ],
+            options={
+                'verbose_name': '추천 결과',
+                'verbose_name_plural': '추천 결과 목록',
+                'ordering': ['user', 'rank'],
+                'unique_together': {('user', 'scholarship')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-14 15:48
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scholarships', '0012_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scholarship',
+            name='academic_year_type_norm',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Replace('academic_year_type', models.Value(' '), models.Value('')), output_field=models.CharField(max_length=255, null=True), verbose_name='학년 유형(정규화)'),
+        ),
+        migrations.AddField(
+            model_name='scholarship',
+            name='university_type_norm',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Replace('university_type', models.Value('-'), models.Value('~')), output_field=models.CharField(max_length=100, null=True), verbose_name='대학 유형(정규화)'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-14 15:48
+
+from django.db import migrations, models
+
+
+def parse_region_fields(region):
+    """
+    이 마이그레이션 시점의 scholarships.models.parse_region_fields 사본입니다.
+    (모델 모듈의 함수가 바뀌거나 옮겨져도 과거 마이그레이션의 동작이 달라지지 않도록 복사해 둡니다.)
+    """
+    region = region or ""
+    is_nationwide = "전국" in region
+    parts = [part.strip() for part in region.split(",") if part.strip()]
+    region_do = parts[0].split()[0] if len(parts) == 1 and not is_nationwide else ""
+    return is_nationwide, region_do
+
+
+def populate_region_fields(apps, schema_editor):
+    Scholarship = apps.get_model('scholarships', 'Scholarship')
+    scholarships = list(Scholarship.objects.only('id', 'region'))
+    for scholarship in scholarships:
+        scholarship.is_nationwide, scholarship.region_do = parse_region_fields(scholarship.region)
+    Scholarship.objects.bulk_update(scholarships, ['is_nationwide', 'region_do'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scholarships', '0013_scholarship_academic_year_type_norm_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scholarship',
+            name='is_nationwide',
+            field=models.BooleanField(db_index=True, default=False, help_text="'전국' 대상 장학금 여부"),
+        ),
+        migrations.AddField(
+            model_name='scholarship',
+            name='region_do',
+            field=models.CharField(blank=True, help_text='단일 지역인 경우의 시/도', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='scholarship',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, help_text='전처리된 지역 정보 (쉼표로 구분)', max_length=512),
+        ),
+        migrations.RunPython(populate_region_fields, migrations.RunPython.noop),
+    ]
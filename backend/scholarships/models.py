@@ -1,7 +1,22 @@
 # scholarships/models.py
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Replace
 from django.contrib.auth.models import User # User 모델 import 필요 (Wishlist에 사용됨)
 
+
+def parse_region_fields(region: str | None) -> tuple[bool, str]:
+    """
+    전처리된 region 문자열(쉼표 구분)에서 (전국 여부, 시/도)를 추출합니다.
+    시/도는 지역이 하나뿐일 때만 채웁니다. (예: '경기도 파주시' -> '경기도', '강원도,경기도' -> '')
+    """
+    region = region or ""
+    is_nationwide = "전국" in region
+    parts = [part.strip() for part in region.split(",") if part.strip()]
+    region_do = parts[0].split()[0] if len(parts) == 1 and not is_nationwide else ""
+    return is_nationwide, region_do
+
+
 class RawScholarship(models.Model):
     # 기본 정보
     product_id = models.CharField(max_length=50, unique=True, verbose_name="고유 번호")
@@ -57,8 +72,28 @@ class Scholarship(models.Model):
     income_criteria_details = models.TextField(null=True, blank=True, verbose_name="소득 기준 상세")  # 소득 기준 상세 (예: "소득 분위 8분위 이내")
     specific_qualification_details = models.TextField(null=True, blank=True, verbose_name="특정 자격 조건 상세")  # 특정 자격 조건 (예: "국가유공자 자녀", "다문화 가정 자녀")
     eligibility_restrictions = models.TextField(null=True, blank=True, verbose_name="자격 제한")  # 자격 제한 (예: "휴학생 제외")
-    region = models.CharField(max_length=512, blank=True, help_text="전처리된 지역 정보 (쉼표로 구분)")
+    region = models.CharField(max_length=512, blank=True, db_index=True, help_text="전처리된 지역 정보 (쉼표로 구분)")
     is_region_processed = models.BooleanField(default=False, help_text="지역 정보 전처리 완료 여부")
+    # region에서 파생되는 컬럼 (save() 시 자동 갱신). is_nationwide는 '전국' LIKE 검색을 인덱스 조회로 대체하고,
+    # region_do는 relevance_score CASE 식에서만 비교하므로 인덱스를 두지 않습니다.
+    is_nationwide = models.BooleanField(default=False, db_index=True, help_text="'전국' 대상 장학금 여부")
+    region_do = models.CharField(max_length=100, blank=True, help_text="단일 지역인 경우의 시/도")
+
+    # 추천 필터링용 정규화 컬럼 (DB가 직접 계산/인덱싱하므로 직접 값을 넣지 않습니다)
+    university_type_norm = models.GeneratedField(
+        expression=Replace("university_type", Value("-"), Value("~")),
+        output_field=models.CharField(max_length=100, null=True),
+        db_persist=True,
+        db_index=True,
+        verbose_name="대학 유형(정규화)",
+    )  # '-'를 '~'로 통일 (예: 4년제(5-6년제포함) -> 4년제(5~6년제포함))
+    academic_year_type_norm = models.GeneratedField(
+        expression=Replace("academic_year_type", Value(" "), Value("")),
+        output_field=models.CharField(max_length=255, null=True),
+        db_persist=True,
+        db_index=True,
+        verbose_name="학년 유형(정규화)",
+    )  # 공백 제거 (예: 대학 1학기 -> 대학1학기)
 
     # 기타 정보
     managing_organization_type = models.CharField(max_length=255, null=True, blank=True, verbose_name="운영 기관 구분")  # 운영 기관 구분
@@ -76,6 +111,13 @@ class Scholarship(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.is_nationwide, self.region_do = parse_region_fields(self.region)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "region" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "is_nationwide", "region_do"}
+        super().save(*args, **kwargs)
+
     def to_dict(self):
         """
         GPT 모델에 전달하기 위한 장학금 정보를 딕셔너리 형태로 반환합니다.
@@ -119,3 +161,21 @@ class Wishlist(models.Model):
     def __str__(self):
         return f"{self.user.username}님의 찜 목록: {self.scholarship.name}"
 
+
+class Recommendation(models.Model):
+    """비대화형(Batch API 등)으로 미리 계산해 둔 사용자별 추천 결과"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="scholarship_recommendations", verbose_name="사용자")
+    scholarship = models.ForeignKey(Scholarship, on_delete=models.CASCADE, verbose_name="장학금")
+    rank = models.PositiveSmallIntegerField(verbose_name="추천 순위")
+    reason = models.TextField(blank=True, verbose_name="추천 사유")
+    batch_id = models.CharField(max_length=100, blank=True, verbose_name="배치 ID")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="생성일")
+
+    class Meta:
+        unique_together = ('user', 'scholarship')
+        ordering = ['user', 'rank']
+        verbose_name = "추천 결과"
+        verbose_name_plural = "추천 결과 목록"
+
+    def __str__(self):
+        return f"{self.user.username}님의 추천 {self.rank}위: {self.scholarship.name}"
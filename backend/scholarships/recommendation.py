@@ -1,73 +1,645 @@
 # scholarships/recommendation.py
 
 import openai
-import json
-import re
-from datetime import datetime
-from django.db.models import QuerySet, Q, Case, When, Value
+import asyncio
+import concurrent.futures
+import threading
+import io
+import orjson
+import tiktoken
+import hashlib
+import math
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import QuerySet, Q, Case, When, Value, Exists
 from django.conf import settings
-from scholarships.models import Scholarship
+from django.core.cache import cache
+from django.utils import timezone
+from scholarships.models import Scholarship, Recommendation
 from userinfor.models import UserScholarship
-from django.db import models
+from django.db import models, transaction
 
 # --- API 키 설정 ---
 openai.api_key = settings.OPENAI_API_KEY
 
+# --- 로깅 ---
+# 단계별 후보 수(COUNT(*) 조회)는 별도 하위 로거로 기록해, 일반 DEBUG 로그와 따로 켜고 끌 수 있게 합니다.
+logger = logging.getLogger(__name__)
+count_logger = logging.getLogger(f"{__name__}.counts")
+
+class _LazyCount:
+    """로그 인자로 넘기는 QuerySet 개수입니다. 해당 로그가 실제로 출력될 때만 COUNT(*)를 실행합니다."""
+    def __init__(self, queryset: QuerySet):
+        self.queryset = queryset
+
+    def __str__(self) -> str:
+        return str(self.queryset.count())
+
+# --- 추천 응답 캐시 설정 ---
+# 프롬프트 템플릿(규칙/출력 형식)을 바꾸면 반드시 버전을 올려 기존 캐시를 무효화합니다.
+RECOMMENDATION_PROMPT_VERSION = "v8"
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60 * 24  # 24시간
+SEMANTIC_CACHE_EMBEDDING_MODEL = "text-embedding-3-small"
+SEMANTIC_CACHE_MAX_DISTANCE = 0.05  # 코사인 거리 기준 (작을수록 엄격)
+SEMANTIC_CACHE_MAX_ENTRIES = 50     # 후보군 1개당 보관할 (임베딩, 응답) 개수
+# 의미 캐시는 추천 규칙(지역/성적/소득/특정 자격)에 쓰이는 값이 모두 같은 요청끼리만 공유하고,
+# 임베딩 비교는 자유 서술 항목(additional_info)에만 적용합니다. (이름/생년월일 등 개인정보는 임베딩 API로 보내지 않음)
+SEMANTIC_CACHE_EXACT_FIELDS = (
+    "region", "income_level", "university_type", "academic_year_type", "major_field",
+    "is_multi_cultural_family", "is_single_parent_family", "is_multiple_children_family", "is_national_merit",
+)
+SEMANTIC_CACHE_GPA_FIELDS = ("gpa_last_semester", "gpa_overall")
+SEMANTIC_CACHE_GPA_BAND = 0.5  # 성적은 이 간격 구간(예: 3.5~3.99)이 같을 때만 공유
+SEMANTIC_CACHE_FREE_TEXT_FIELD = "additional_info"
+
+# 의미 캐시 저장(임베딩 호출 포함)을 응답 경로 밖에서 처리하는 백그라운드 스레드
+_semantic_cache_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="semantic-cache")
+
+# --- 필터링용 장학금 속성 캐시 (Scholarship 저장/삭제 시 signals.py에서 무효화) ---
+UNIVERSITY_TYPES_CACHE_KEY = "sch:univ_types"
+ACADEMIC_YEARS_CACHE_KEY = "sch:academic_years"
+SCHOLARSHIP_FILTER_CACHE_TIMEOUT = 60 * 60  # 1시간
+# 같은 필터 조건(대학/학년/전공/지역)의 점수순 샘플 ID 캐시. 장학금이 바뀌면 세대 값을 바꿔 한꺼번에 무효화합니다.
+CANDIDATE_CACHE_PREFIX = "sch:cand"
+CANDIDATE_CACHE_GENERATION_KEY = "sch:cand_gen"
+CANDIDATE_CACHE_TIMEOUT = 60 * 10  # 10분
+
+# --- 다중 사용자 일괄 추천 설정 ---
+RECOMMEND_MANY_USERS_PER_CALL = 5   # GPT 호출 1회에 묶을 사용자 수
+RECOMMEND_MANY_MAX_PROMPT_TOKENS = 100_000  # 묶음 1개(시스템 규칙 포함)의 입력 토큰 상한
+GPT_MAX_CONCURRENT_CALLS = 10       # 동시에 진행할 GPT 호출 수 (요금제 rate limit 보호)
+
+# --- 동일 요청 합치기 (single-flight) ---
+# 같은 캐시 키의 GPT 단계가 이 프로세스에서 이미 진행 중이면 새로 호출하지 않고 그 결과를 함께 기다립니다.
+# 요청마다 이벤트 루프가 따로 생기므로(async_to_sync) asyncio.Future 대신 스레드 간 공유되는 concurrent Future를 씁니다.
+_inflight_gpt_calls: dict[str, concurrent.futures.Future] = {}
+_inflight_gpt_calls_lock = threading.Lock()
+
+# --- OpenAI Batch API 설정 (야간 일괄 갱신용, 실시간 대비 약 50% 저렴 / 최대 24시간 소요) ---
+BATCH_API_ENDPOINT = "/v1/chat/completions"
+BATCH_API_COMPLETION_WINDOW = "24h"
+# completed인데 결과 파일 없이 오류 파일만 있는 경우(모든 요청 실패)를 구분하기 위해 recommend_batch_collect가 반환하는 상태
+BATCH_NO_OUTPUT_STATUS = "completed_without_output"
+BATCH_API_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled", BATCH_NO_OUTPUT_STATUS)  # 더 이상 바뀌지 않는 Batch 상태
+# 실시간 추천 API가 GPT 호출 없이 그대로 내보낼 수 있는 저장된 추천(Recommendation)의 최대 경과 시간
+# (Batch 완료 기한 24시간 + 하루 1회 갱신 주기)
+STORED_RECOMMENDATION_MAX_AGE = timedelta(days=2)
+
+# --- 시스템 메시지 고정 블록 ---
+# 매 요청마다 동일한 '지시 + 규칙 + 출력 형식' 블록은 system 메시지로 보내고, user 메시지에는
+# '사용자 + 후보군'만 담습니다. 호출마다 같은 접두부가 되어 OpenAI 측 프롬프트 캐시(반복 접두부 할인)가 적용됩니다.
+# 단일 사용자 / 여러 사용자 묶음 호출이 함께 쓰는 역할과 평가 규칙입니다. [업무 지시]와 [출력 형식]은 호출 형태별로 따로 붙입니다.
+_RECOMMENDATION_ROLE = """
+    당신은 장학금 추천 시스템입니다. 사용자의 요청에 따라 정확한 JSON 형식으로만 응답해야 합니다.
+    당신은 사용자의 프로필과 장학금 자격 조건을 비교하여, 개인화된 추천 메시지를 작성하는 AI 카피라이터입니다.
+"""
+
+_RECOMMENDATION_RULES = """
+    **[매우 중요한 규칙]**
+    1.  **사실 기반 작성:** reason'을 작성할 때는 아래 규칙을 반드시 따르고, **규칙에 해당하는 내용만을 근거로** 사실에 기반하여 작성하세요. 절대 추측하거나 없는 내용을 지어내지 마세요.
+        규칙1.  **지역 조건:** 사용자 프로필의 지역('region')과 장학금의 'region'이 구체적으로 일치할수록 높은 점수를 주세요. '전국'은 그 다음입니다.
+
+        규칙2.  **성적 조건:** 사용자의 성적(gpa_last_semester, gpa_overall)과 장학금의 'grade_criteria_details'를 비교하여, 기준을 충족하면 점수를 부여하세요.
+
+        규칙3.  **소득 조건:** 사용자의 소득분위('income_level')와 장학금의 'income_criteria_details'를 비교하여, 기준에 부합하면 점수를 부여하세요. 
+
+        규칙4.  **특정 자격 조건 (가산점 항목):**
+            - 만약 사용자의 'is_multi_cultural_family'가 True이고, 장학금 설명(주로 'specific_qualification_details')에 '다문화'라는 텍스트가 있으면 높은 가산점을 주세요.
+            - 만약 사용자의 'is_single_parent_family'가 True이고, 장학금의 'income_criteria_details'에 '한부모', '가정형편', '경제사정'라는 텍스트가 있으면 높은 가산점을 주세요.
+            - 만약 사용자의 'is_multiple_children_family'가 True이고, 장학금의'income_criteria_details'에 '다자녀'라는 텍스트가 있으면 높은 가산점을 주세요.
+            - 만약 사용자의 'is_national_merit'가 True이고, 장학금의'income_criteria_details'에 '국가유공자' 또는 '보훈'이라는 텍스트가 있으면 높은 가산점을 주세요.
+
+        규칙5.  **기타 조건:** 위 조건 외에도 사용자의 전공, 학년 등이 장학금의 조건과 일치하는지 종합적으로 고려하세요.
+        
+    2.  **구체적인 이유 제시:** 'reason'에는 왜 이 장학금이 사용자에게 적합한지, 어떤 조건(예: 지역, 성적, 소득, 특정 자격)이 어떻게 부합하는지 **구체적으로** 서술하세요.
+"""
+
+_RECOMMENDATION_ITEM_FORMAT = """
+    - 각 추천 항목은 'product_id'와 'reason' 두 개의 키를 가진 JSON 객체여야 합니다.
+    - 'reason'은 사용자에게 보여줄 최종 추천 사유(한국어 문자열)입니다. 만약 규칙4로 인해 가산점을 얻은 경우, 'reason'에 그와 관련된 내용을 반드시 서술하세요. 
+    - 'product_id'는 절대 변경하지 마세요.
+"""
+
+RECOMMENDATION_SYSTEM_RULES = _RECOMMENDATION_ROLE + """
+    [업무 지시]
+    사용자 메시지로 전달되는 [사용자 프로필]과 [분석 대상 장학금 목록]을 분석하여, 가장 적합한 **상위 5개의 장학금**을 적합도 순으로 정렬하여 JSON 객체의 'recommendations' 배열에 담아 반환하세요.
+""" + _RECOMMENDATION_RULES + """
+    **[출력 형식]**
+    - 최종 출력은 'recommendations' 배열 하나를 가진 JSON 객체입니다.""" + _RECOMMENDATION_ITEM_FORMAT + """
+    **[출력 예시]**
+    {"recommendations": [
+      {
+        "product_id": "장학금B_지자체B",
+        "reason": "거주하시는 '경기도 파주시' 지역 조건에 부합하며, 직전 학기 성적(4.1)이 요구 기준(3.5 이상)을 충족합니다."
+      },
+      {
+        "product_id": "장학금A_재단A",
+        "reason": "'다자녀 가정' 자격에 해당하며, '전국' 단위로 지원 가능하여 지역 제한이 없습니다."
+      }
+    ]}
+"""
+
+# 여러 사용자를 한 번에 처리하는 묶음 호출(recommend_many)용 규칙입니다. 출력은 {"users": [...]} 객체 하나입니다.
+BATCH_RECOMMENDATION_SYSTEM_RULES = _RECOMMENDATION_ROLE + """
+    [업무 지시]
+    사용자 메시지로 전달되는 'users' 배열의 각 사용자는 자신의 'profile'(사용자 프로필)과 'candidates'(분석 대상 장학금 목록)를 가집니다.
+    각 사용자마다 아래 규칙을 독립적으로 적용하여, 해당 사용자의 'candidates' 안에서만 가장 적합한 **상위 5개의 장학금**을 적합도 순으로 고르세요.
+""" + _RECOMMENDATION_RULES + """
+    **[출력 형식]**
+    - 최종 출력은 'users' 배열 하나를 가진 JSON 객체이며, 입력의 사용자마다 'user_id'와 'recommendations'를 가진 객체를 하나씩 담습니다.""" + _RECOMMENDATION_ITEM_FORMAT + """
+    **[출력 예시]**
+    {"users": [
+      {"user_id": 12, "recommendations": [
+        {"product_id": "장학금B_지자체B", "reason": "거주하시는 '경기도 파주시' 지역 조건에 부합합니다."}
+      ]},
+      {"user_id": 34, "recommendations": [
+        {"product_id": "장학금A_재단A", "reason": "'다자녀 가정' 자격에 해당하며, '전국' 단위로 지원 가능합니다."}
+      ]}
+    ]}
+"""
+
+# 실시간 추천용 규칙입니다. 화면에는 추천 사유를 보여주지 않으므로, 긴 자격 설명 없이 압축 필드(GPT_RANKING_FIELDS)만
+# 보고 순위만 매기게 하여 GPT 호출 1회(출력은 product_id뿐)로 끝냅니다.
+# 상세 설명을 읽고 추천 사유를 쓰는 위 규칙은 Recommendation에 저장하는 Batch/묶음 경로에서만 씁니다.
+RANKING_SYSTEM_RULES = """
+    당신은 장학금 추천 시스템입니다. 사용자의 요청에 따라 정확한 JSON 형식으로만 응답해야 합니다.
+
+    [업무 지시]
+    사용자 메시지로 전달되는 [사용자 프로필]과 [분석 대상 장학금 목록]을 비교하여, 적합도가 높은 장학금을 순서대로 고르세요.
+    - 지역('region')이 구체적으로 일치할수록 우선하며, '전국'은 그 다음입니다.
+    - 사용자의 대학구분, 학년, 전공이 장학금의 'university_type', 'academic_year_type', 'major_field'와 일치하는지 고려하세요.
+
+    **[출력 형식]**
+    - 'product_id' 키 하나만 가진 JSON 객체들을 적합도 순으로 'recommendations' 배열에 담아 반환하세요. 'product_id'는 절대 변경하지 마세요.
+      {"recommendations": [{"product_id": "장학금B_지자체B"}, {"product_id": "장학금A_재단A"}]}
+"""
+
 # --- GPT 상호작용 헬퍼 함수 ---
-def call_gpt(prompt: str) -> str:
-    """OpenAI GPT 모델을 호출하고 응답 텍스트를 반환합니다."""
+def _gpt_messages(prompt: str, system_rules: str = RECOMMENDATION_SYSTEM_RULES) -> list:
+    return [
+        {"role": "system", "content": system_rules},
+        {"role": "user", "content": prompt}
+    ]
+
+def _recommendation_response_format(product_ids, with_reason: bool = True) -> dict:
+    """
+    Structured Outputs(json_schema, strict) 응답 형식입니다. product_id를 후보 ID의 enum으로 제한해
+    모델이 후보 밖의 ID를 만들지 못하게 하고, 응답이 항상 {"recommendations": [...]} JSON 객체가 되도록 합니다.
+    (strict 모드는 minLength 같은 길이 제약을 지원하지 않아 사유 길이는 프롬프트 규칙으로만 안내합니다.)
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "scholarship_recommendations",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"recommendations": _recommendation_items_schema(product_ids, with_reason)},
+                "required": ["recommendations"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def _recommendation_items_schema(product_ids, with_reason: bool = True) -> dict:
+    """추천 항목({product_id, reason}) 배열의 JSON Schema입니다. product_id는 후보 ID enum으로 제한합니다."""
+    item_properties = {"product_id": {"type": "string", "enum": list(product_ids)}}
+    if with_reason:
+        item_properties["reason"] = {"type": "string"}
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": item_properties,
+            "required": list(item_properties),
+            "additionalProperties": False,
+        },
+    }
+
+def _grouped_recommendation_response_format(group: list) -> dict:
+    """
+    묶음 호출용 Structured Outputs 형식입니다. 응답은 항상 {"users": [{user_id, recommendations}, ...]} 객체가 됩니다.
+    (스키마는 사용자별로 나눌 수 없어 product_id enum은 묶음 전체 후보의 합집합이며, 사용자별 검증은 응답 후에 다시 합니다.)
+    """
+    product_ids = list(dict.fromkeys(pid for ctx in group for pid in ctx["sampled_ids"]))
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "grouped_scholarship_recommendations",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "users": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "user_id": {"type": "integer", "enum": [ctx["user_id"] for ctx in group]},
+                                "recommendations": _recommendation_items_schema(product_ids),
+                            },
+                            "required": ["user_id", "recommendations"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["users"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def _gpt_request_body(prompt: str, system_rules: str = RECOMMENDATION_SYSTEM_RULES, model: str | None = None,
+                      response_format: dict | None = None) -> dict:
+    """Chat Completions 요청 본문입니다. 실시간 호출과 Batch API 요청이 같은 설정을 공유합니다."""
+    body = {
+        "model": model or settings.OPENAI_RECOMMENDATION_MODEL,
+        "messages": _gpt_messages(prompt, system_rules),
+        "temperature": 0.1,
+    }
+    if response_format:
+        body["response_format"] = response_format
+    return body
+
+def call_gpt_stream(prompt: str, system_rules: str = RECOMMENDATION_SYSTEM_RULES, model: str | None = None,
+                    api_base: str | None = None, api_key: str | None = None, response_format: dict | None = None):
+    """
+    stream=True로 GPT를 호출하여, 응답 텍스트 조각을 도착하는 대로 내보냅니다.
+    소비 측이 중간에 close()하면 스트림도 바로 닫아, 남은 토큰을 끝까지 받지 않고 연결을 돌려줍니다.
+    api_base/api_key를 주면 해당 호출만 OpenAI 호환 서버(로컬 LLM 등)로 보냅니다. (None이면 기본 엔드포인트와 키)
+    호출이 중간에 실패하면 로그를 남긴 뒤 예외를 다시 던져, 소비 측이 끊긴 응답을 완성된 응답과 구분할 수 있게 합니다.
+    """
+    chunks = None
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "당신은 장학금 추천 시스템입니다. 사용자의 요청에 따라 정확한 JSON 형식으로만 응답해야 합니다."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1
+        chunks = openai.ChatCompletion.create(
+            **_gpt_request_body(prompt, system_rules, model, response_format), stream=True,
+            api_base=api_base, api_key=api_key,
         )
-        gpt_response_content = response['choices'][0]['message']['content']
-        
-        print("DEBUG: [GPT 응답 원본]")
-        print(gpt_response_content)
-        
-        return gpt_response_content
+        for chunk in chunks:
+            if not chunk['choices']:
+                continue
+            content = chunk['choices'][0].get('delta', {}).get('content')
+            if content:
+                yield content
     except openai.error.OpenAIError as e:
-        print(f"DEBUG: 오류: OpenAI API 호출 실패: {e}")
+        logger.error("OpenAI API 스트리밍 호출 실패: %s", e)
+        raise
+    except Exception as e:
+        logger.error("GPT 스트리밍 호출 중 알 수 없는 오류 발생: %s", e)
+        raise
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+async def acall_gpt(prompt: str, system_rules: str = RECOMMENDATION_SYSTEM_RULES,
+                    response_format: dict | None = None) -> str:
+    """GPT를 비동기로 호출하고 응답 텍스트를 반환합니다. 여러 호출을 asyncio.gather로 동시에 진행할 때 사용합니다."""
+    try:
+        response = await openai.ChatCompletion.acreate(
+            **_gpt_request_body(prompt, system_rules, response_format=response_format)
+        )
+        return response['choices'][0]['message']['content']
+    except openai.error.OpenAIError as e:
+        logger.error("OpenAI API 비동기 호출 실패: %s", e)
         return ""
     except Exception as e:
-        print(f"DEBUG: 오류: GPT 호출 중 알 수 없는 오류 발생: {e}")
+        logger.error("GPT 비동기 호출 중 알 수 없는 오류 발생: %s", e)
         return ""
 
+async def _acall_gpt_many(prompts: list, system_rules: str = RECOMMENDATION_SYSTEM_RULES,
+                          response_formats: list | None = None) -> list:
+    """세마포어로 동시 호출 수를 제한하면서 여러 프롬프트를 병렬로 호출합니다. (response_formats는 프롬프트별 응답 형식)"""
+    semaphore = asyncio.Semaphore(GPT_MAX_CONCURRENT_CALLS)
+    response_formats = response_formats or [None] * len(prompts)
+
+    async def _limited_call(prompt: str, response_format: dict | None) -> str:
+        async with semaphore:
+            return await acall_gpt(prompt, system_rules, response_format)
+
+    return await asyncio.gather(*[
+        _limited_call(prompt, response_format) for prompt, response_format in zip(prompts, response_formats)
+    ])
+
+def _dumps(obj) -> str:
+    """프롬프트/캐시용 JSON 직렬화입니다. orjson은 한글을 그대로 쓰며, 들여쓰기 없이 출력해 토큰을 아낍니다."""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _dumps_sorted(obj) -> bytes:
+    """캐시 키 해시용 직렬화입니다. 키를 정렬해 같은 내용이면 항상 같은 바이트가 나옵니다."""
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+class _JsonBracketScanner:
+    """
+    JSON 괄호 구조를 한 글자씩 추적하는 스캐너입니다. (정규식 역추적 없음)
+    문자열 안의 괄호/이스케이프는 무시하고, 괄호 밖의 설명 문장에 쓰인 따옴표는 문자열로 보지 않습니다.
+    """
+    __slots__ = ("stack", "in_string", "escaped")
+
+    def __init__(self):
+        self.stack = []
+        self.in_string = self.escaped = False
+
+    def feed(self, ch: str) -> str | None:
+        """ch가 구조 괄호면 'open'/'close'를, 그 외에는 None을 반환합니다."""
+        if self.in_string:
+            if self.escaped:
+                self.escaped = False
+            elif ch == '\\':
+                self.escaped = True
+            elif ch == '"':
+                self.in_string = False
+        elif ch == '"':
+            self.in_string = bool(self.stack)
+        elif ch in '[{':
+            self.stack.append(ch)
+            return "open"
+        elif ch in ']}' and self.stack:
+            self.stack.pop()
+            return "close"
+        return None
+
+def _balanced_json_end(text: str, start: int) -> int:
+    """text[start]에서 시작한 괄호가 닫히는 위치를 반환합니다. 닫히지 않으면 -1입니다."""
+    scanner = _JsonBracketScanner()
+    for i in range(start, len(text)):
+        if scanner.feed(text[i]) == "close" and not scanner.stack:
+            return i
+    return -1
+
 def extract_json_from_gpt_response(gpt_response_content: str) -> str:
-    """GPT 응답 텍스트에서 JSON 배열 또는 객체를 찾습니다."""
-    match = re.search(r"\[.*\]|{.*}", gpt_response_content, re.DOTALL)
-    return match.group(0) if match else "[]"
+    """
+    GPT 응답 텍스트에서 파싱 가능한 첫 JSON 배열 또는 객체를 찾습니다.
+    설명 문장 속 괄호(예: '[참고]')처럼 파싱되지 않는 구간이면 그 구간 뒤의 다음 '['/'{'부터 다시 찾습니다.
+    """
+    text = gpt_response_content
+    pos = 0
+    while True:
+        start = min((i for i in (text.find('[', pos), text.find('{', pos)) if i >= 0), default=-1)
+        if start < 0:
+            return "[]"
+        end = _balanced_json_end(text, start)
+        if end < 0:
+            return "[]"  # 닫히지 않은 JSON (응답이 중간에 끊긴 경우). 안쪽 항목 일부만 돌려주지 않습니다.
+        try:
+            orjson.loads(text[start:end + 1])
+            return text[start:end + 1]
+        except orjson.JSONDecodeError:
+            pos = end + 1
+
+def iter_json_array_items(text_chunks):
+    """
+    조각난 GPT 응답 텍스트에서 JSON 배열 안의 객체를, 닫는 '}'가 도착하는 즉시 하나씩 파싱해 내보냅니다.
+    배열 밖의 설명 문장은 건너뛰고, 끝까지 닫히지 않은 마지막 객체는 내보내지 않습니다.
+    """
+    scanner = _JsonBracketScanner()
+    item_chars = None   # 수집 중인 객체의 문자들 (수집 중이 아니면 None)
+    item_depth = 0
+    for chunk in text_chunks:
+        for ch in chunk:
+            if item_chars is not None:
+                item_chars.append(ch)
+            in_array = bool(scanner.stack) and scanner.stack[-1] == '['
+            event = scanner.feed(ch)
+            if event == "open":
+                if ch == '{' and item_chars is None and in_array:
+                    item_chars, item_depth = ['{'], len(scanner.stack) - 1
+            elif event == "close" and item_chars is not None and len(scanner.stack) == item_depth:
+                try:
+                    yield orjson.loads(''.join(item_chars))
+                except orjson.JSONDecodeError as e:
+                    logger.error("스트리밍 JSON 항목 파싱 실패: %s", e)
+                item_chars = None
 
 def safe_parse_json(response_text: str):
     """GPT 응답 텍스트에서 JSON을 안전하게 파싱합니다."""
+    if not response_text:
+        return []  # 호출 실패("")나 Structured Outputs 거절 응답(content=None)
+    if response_text.lstrip()[:1] in ('[', '{'):
+        try:
+            return orjson.loads(response_text)  # Structured Outputs 응답/캐시 값은 본문 전체가 JSON
+        except orjson.JSONDecodeError:
+            pass
+    # 설명 문장이 섞인 응답만 스캐너로 JSON 부분을 잘라냅니다.
     try:
         json_str = extract_json_from_gpt_response(response_text)
-        return json.loads(json_str) if json_str.strip() else []
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"오류: JSON 파싱 실패: {e} - 응답 내용: '{response_text[:200]}...'")
+        return orjson.loads(json_str) if json_str.strip() else []
+    except (orjson.JSONDecodeError, Exception) as e:
+        logger.error("JSON 파싱 실패: %s - 응답 내용: '%s...'", e, response_text[:200])
         return []
 
 
+# --- GPT 응답 캐시 (정확 일치 + 의미 유사도) ---
+def _recommendation_cache_key(user_info_dict: dict, product_ids) -> str:
+    """(사용자 프로필, 정렬된 후보 ID, 프롬프트 버전)으로 정확 일치 캐시 키를 만듭니다."""
+    payload = _dumps_sorted({"u": user_info_dict, "ids": sorted(product_ids), "v": RECOMMENDATION_PROMPT_VERSION})
+    return "gpt:rec:" + hashlib.sha256(payload).hexdigest()
+
+def _semantic_cache_key(user_info_dict: dict, product_ids) -> str:
+    """
+    후보군과 추천 규칙에 쓰이는 프로필 값(SEMANTIC_CACHE_EXACT_FIELDS, 성적 구간)이 모두 같은 요청끼리만
+    의미 캐시를 비교하도록 키를 만듭니다.
+    """
+    eligibility = {field: user_info_dict.get(field) for field in SEMANTIC_CACHE_EXACT_FIELDS}
+    for field in SEMANTIC_CACHE_GPA_FIELDS:
+        gpa = user_info_dict.get(field) or 0.0
+        eligibility[field] = math.floor(gpa / SEMANTIC_CACHE_GPA_BAND) * SEMANTIC_CACHE_GPA_BAND
+    payload = _dumps_sorted({"e": eligibility, "ids": sorted(product_ids), "v": RECOMMENDATION_PROMPT_VERSION})
+    return "gpt:rec:sem:" + hashlib.sha256(payload).hexdigest()
+
+def _profile_free_text(user_info_dict: dict) -> str:
+    return (user_info_dict.get(SEMANTIC_CACHE_FREE_TEXT_FIELD) or "").strip()
+
+def _get_free_text_embedding(free_text: str):
+    """
+    프로필의 자유 서술 항목을 임베딩 벡터로 변환합니다. 실패 시 None을 반환해 의미 캐시를 건너뜁니다.
+    임베딩은 후보군과 무관하게 텍스트만으로 정해지므로, 텍스트 해시 단위로 캐시해 후보군이 바뀌어도 재사용합니다.
+    """
+    embedding_cache_key = "gpt:emb:" + hashlib.sha256(
+        (SEMANTIC_CACHE_EMBEDDING_MODEL + free_text).encode()
+    ).hexdigest()
+    try:
+        embedding = cache.get(embedding_cache_key)
+        if embedding:
+            return embedding
+    except Exception as e:
+        logger.warning("프로필 임베딩 캐시 조회 실패: %s", e)
+
+    try:
+        response = openai.Embedding.create(model=SEMANTIC_CACHE_EMBEDDING_MODEL, input=free_text)
+        embedding = response['data'][0]['embedding']
+    except Exception as e:
+        logger.warning("프로필 임베딩 생성 실패, 의미 캐시를 건너뜁니다: %s", e)
+        return None
+
+    try:
+        cache.set(embedding_cache_key, embedding, RECOMMENDATION_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("프로필 임베딩 캐시 저장 실패: %s", e)
+    return embedding
+
+def _cosine_distance(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return 1.0 - dot / norm if norm else 1.0
+
+def get_cached_recommendation(user_info_dict: dict, product_ids) -> str | None:
+    """정확 일치 캐시에서 추천 응답을 조회합니다. 캐시(Redis) 장애 시 None을 반환합니다."""
+    try:
+        return cache.get(_recommendation_cache_key(user_info_dict, product_ids))
+    except Exception as e:
+        logger.warning("GPT 캐시 조회 실패: %s", e)
+        return None
+
+def set_cached_recommendation(user_info_dict: dict, product_ids, response_text: str) -> None:
+    """파싱 가능한 추천 응답을 정확 일치 캐시에 저장합니다."""
+    try:
+        cache.set(_recommendation_cache_key(user_info_dict, product_ids), response_text, RECOMMENDATION_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("GPT 캐시 저장 실패: %s", e)
+
+def _lookup_cached_response(user_info_dict: dict, product_ids):
+    """
+    정확 일치 캐시 → 의미 유사도 캐시 순으로 추천 응답을 조회합니다.
+    의미 캐시 항목은 (자유 서술 임베딩 또는 None, 응답)이며, 자유 서술이 비어 있으면 임베딩 없이 None 항목과 바로 일치합니다.
+    (캐시된 응답 또는 None, 의미 캐시 저장에 쓸 (임베딩, 기존 항목))을 반환합니다.
+    """
+    cached_response = get_cached_recommendation(user_info_dict, product_ids)
+    if cached_response:
+        logger.debug("[GPT 캐시] 정확 일치 캐시 적중")
+        return cached_response, (None, [])
+
+    semantic_entries = []
+    try:
+        semantic_entries = cache.get(_semantic_cache_key(user_info_dict, product_ids)) or []
+    except Exception as e:
+        # 캐시(Redis) 장애가 추천 자체를 막지 않도록 GPT 호출로 진행합니다.
+        logger.warning("GPT 의미 캐시 조회 실패: %s", e)
+
+    free_text = _profile_free_text(user_info_dict)
+    embedding = None
+    if not free_text:
+        matched = next((response for cached_embedding, response in semantic_entries if cached_embedding is None), None)
+    else:
+        # 비교할 항목이 없으면 임베딩 호출을 GPT 앞에 두지 않고, 응답을 저장할 때 만듭니다.
+        if any(cached_embedding is not None for cached_embedding, _ in semantic_entries):
+            embedding = _get_free_text_embedding(free_text)
+        matched = next((
+            response for cached_embedding, response in semantic_entries
+            if embedding and cached_embedding is not None
+            and _cosine_distance(embedding, cached_embedding) < SEMANTIC_CACHE_MAX_DISTANCE
+        ), None)
+    if matched:
+        logger.debug("[GPT 캐시] 의미 유사도 캐시 적중")
+        set_cached_recommendation(user_info_dict, product_ids, matched)
+        return matched, (None, [])
+    return None, (embedding, semantic_entries)
+
+def _store_cached_response(user_info_dict: dict, product_ids, response_text: str, semantic_state) -> None:
+    """
+    검증을 통과한 응답을 정확 일치 캐시와 의미 캐시에 저장합니다.
+    자유 서술의 임베딩을 새로 만들어야 하면 의미 캐시 저장은 백그라운드 스레드로 넘겨, 응답이 임베딩 호출을 기다리지 않게 합니다.
+    """
+    set_cached_recommendation(user_info_dict, product_ids, response_text)
+    embedding, _ = semantic_state
+    if _profile_free_text(user_info_dict) and embedding is None:
+        _semantic_cache_executor.submit(
+            _store_semantic_cache_entry, user_info_dict, product_ids, response_text, semantic_state
+        )
+    else:
+        _store_semantic_cache_entry(user_info_dict, product_ids, response_text, semantic_state)
+
+def _store_semantic_cache_entry(user_info_dict: dict, product_ids, response_text: str, semantic_state) -> None:
+    """응답을 의미 캐시에 추가합니다. (자유 서술이 있으면 그 임베딩과 함께)"""
+    embedding, semantic_entries = semantic_state
+    free_text = _profile_free_text(user_info_dict)
+    if free_text and embedding is None:
+        embedding = _get_free_text_embedding(free_text)
+        if embedding is None:
+            return
+    if not free_text:
+        # 자유 서술 없는 항목은 키가 같으면 결과도 같으므로 하나만 유지합니다.
+        semantic_entries = [entry for entry in semantic_entries if entry[0] is not None]
+    semantic_entries = (semantic_entries + [(embedding, response_text)])[-SEMANTIC_CACHE_MAX_ENTRIES:]
+    try:
+        cache.set(_semantic_cache_key(user_info_dict, product_ids), semantic_entries, RECOMMENDATION_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("GPT 의미 캐시 저장 실패: %s", e)
+
+
 # --- 데이터 준비 헬퍼 함수 ---
-def _scholarship_to_simplified_dict(scholarship_obj):
-    """GPT가 상세 비교를 할 수 있도록, 원본 상세 텍스트를 전달합니다."""    
-    return {
-        "product_id": scholarship_obj.product_id,
-        "name": scholarship_obj.name, 
-        "product_type": scholarship_obj.product_type,
-        "university_type": scholarship_obj.university_type,
-        "academic_year_type": scholarship_obj.academic_year_type,
-        "major_field": scholarship_obj.major_field, 
-        "region": scholarship_obj.region,
-        "grade_criteria_details": scholarship_obj.grade_criteria_details,
-        "income_criteria_details": scholarship_obj.income_criteria_details,
-        "specific_qualification_details": scholarship_obj.specific_qualification_details,
-    }
+# GPT가 상세 비교를 할 수 있도록 원본 상세 텍스트를 포함해 전달할 컬럼들입니다.
+# 결과 모델이 필요 없는 일괄 경로에서는 모델 인스턴스를 만들지 않고 .values(*GPT_SCHOLARSHIP_FIELDS)로 바로 딕셔너리를 받아옵니다.
+GPT_SAMPLE_SIZE = 30
+# 후보가 최종 추천 개수(5개) 이하이면 고를 것이 없으므로 GPT를 호출하지 않고 점수 순서 그대로 반환합니다.
+# (추천 사유를 저장하는 Batch 경로는 사유 작성을 위해 그대로 GPT를 거칩니다.)
+GPT_SKIP_MAX_CANDIDATES = 5
+GPT_SCHOLARSHIP_FIELDS = (
+    "product_id",
+    "name",
+    "product_type",
+    "university_type",
+    "academic_year_type",
+    "major_field",
+    "region",
+    "grade_criteria_details",
+    "income_criteria_details",
+    "specific_qualification_details",
+)
+# 필터링/점수 계산에만 쓰이고 응답 직렬화(ScholarshipSerializer)에는 없는 컬럼 (실시간 경로 샘플 조회에서 제외)
+SAMPLE_DEFERRED_FIELDS = ("is_nationwide", "region_do", "university_type_norm", "academic_year_type_norm")
+# 실시간 순위 매기기에 보내는 압축 필드 (상세 설명 3종은 추천 사유를 쓰는 Batch/묶음 경로에만 보냅니다)
+GPT_RANKING_FIELDS = (
+    "product_id",
+    "name",
+    "university_type",
+    "academic_year_type",
+    "major_field",
+    "region",
+)
+
+# --- 추천 요청 단위 프로필 정규화 ---
+@dataclass(frozen=True)
+class NormalizedProfile:
+    """한 번의 추천 요청에서 필터링/점수/프롬프트 단계가 함께 쓰는 사용자 프로필 값입니다. (앞뒤 공백 제거 완료)"""
+    user_id: int
+    university_type: str
+    academic_year_type: str
+    major_field: str
+    region_do: str
+    district: str
+    full_region: str  # '시/도 시/군/구'
+    info_dict: dict   # 프롬프트용 사용자 정보 (지역은 full_region 하나로 합침)
+
+    @property
+    def region_parts(self) -> list:
+        return [part for part in (self.region_do, self.district) if part]
+
+def normalize_profile(user_profile: "UserScholarship | NormalizedProfile") -> NormalizedProfile:
+    """UserScholarship에서 NormalizedProfile을 만듭니다. 이미 정규화된 값이면 그대로 반환합니다."""
+    if isinstance(user_profile, NormalizedProfile):
+        return user_profile
+    region_do = (user_profile.region or "").strip()
+    district = (user_profile.district or "").strip()
+    full_region = ' '.join(filter(None, [region_do, district]))
+    info_dict = user_profile.to_dict()
+    info_dict['region'] = full_region
+    info_dict.pop('district', None)
+    return NormalizedProfile(
+        user_id=user_profile.user_id,
+        university_type=(user_profile.university_type or "").strip(),
+        academic_year_type=(user_profile.academic_year_type or "").strip(),
+        major_field=(user_profile.major_field or "").strip(),
+        region_do=region_do,
+        district=district,
+        full_region=full_region,
+        info_dict=info_dict,
+    )
+
 
 # --- 1단계: DB 사전 필터링 함수들 ---
 def filter_scholarships_by_date(scholarships_queryset: QuerySet) -> QuerySet:
@@ -77,206 +649,667 @@ def filter_scholarships_by_date(scholarships_queryset: QuerySet) -> QuerySet:
            recruitment_start_date__lte=current_date,
            recruitment_end_date__gte=current_date
        )
-    print(f"DEBUG: [0. 날짜 필터링] 필터링 후 장학금 수: {filtered_qs.count()}")
+    count_logger.debug("[0. 날짜 필터링] 필터링 후 장학금 수: %s", _LazyCount(filtered_qs))
     return filtered_qs
 
-def filter_basic(scholarships_queryset: QuerySet, user_profile: UserScholarship) -> QuerySet:
+def _get_distinct_filter_values() -> dict:
+    """
+    대학 유형/학년 유형 정규화 컬럼의 고유값 목록을 {캐시 키: 값 목록}으로 반환합니다.
+    관리자가 장학금을 가져올 때만 바뀌는 값이므로 프로세스 간 공유 캐시에 보관하고, Scholarship 저장/삭제 시 무효화합니다.
+    캐시에 없으면 두 컬럼을 한 번의 DISTINCT 쿼리로 읽어 함께 채웁니다.
+    """
+    cache_keys = [UNIVERSITY_TYPES_CACHE_KEY, ACADEMIC_YEARS_CACHE_KEY]
+    try:
+        cached_values = cache.get_many(cache_keys)
+        if len(cached_values) == len(cache_keys):
+            return cached_values
+    except Exception as e:
+        logger.warning("장학금 속성 캐시 조회 실패: %s", e)
+
+    university_types, academic_years = set(), set()
+    for university_type, academic_year in Scholarship.objects.values_list(
+        'university_type_norm', 'academic_year_type_norm'
+    ).distinct():
+        if university_type:
+            university_types.add(university_type)
+        if academic_year:
+            academic_years.add(academic_year)
+    filter_values = {
+        UNIVERSITY_TYPES_CACHE_KEY: sorted(university_types),
+        ACADEMIC_YEARS_CACHE_KEY: sorted(academic_years),
+    }
+    try:
+        cache.set_many(filter_values, SCHOLARSHIP_FILTER_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("장학금 속성 캐시 저장 실패: %s", e)
+    return filter_values
+
+def invalidate_scholarship_filter_cache() -> None:
+    """필터링용 장학금 속성 캐시를 비우고, 후보 샘플 캐시의 세대 값을 바꿔 기존 항목을 모두 무효화합니다."""
+    try:
+        cache.delete_many([UNIVERSITY_TYPES_CACHE_KEY, ACADEMIC_YEARS_CACHE_KEY])
+        cache.set(CANDIDATE_CACHE_GENERATION_KEY, time.time_ns(), None)
+    except Exception as e:
+        logger.warning("장학금 속성 캐시 무효화 실패: %s", e)
+
+def _filter_if_any_match(scholarships_queryset: QuerySet, condition: Q) -> QuerySet:
+    """
+    condition에 맞는 장학금이 하나라도 있을 때만 필터를 적용합니다.
+    ('일치하는 항목이 없으면 필터를 생략'하는 기존 동작을 별도 조회 없이 한 쿼리 안에서 처리합니다.)
+    """
+    return scholarships_queryset.filter(condition | ~Exists(scholarships_queryset.filter(condition)))
+
+def filter_basic(scholarships_queryset: QuerySet, profile: NormalizedProfile) -> QuerySet:
     """사용자의 대학구분, 학년구분, 학과(전공)에 따라 장학금을 필터링합니다."""
-    print(f"DEBUG: [1. 기본 필터링] 사용자 프로필: 대학='{user_profile.university_type}', 학년='{user_profile.academic_year_type}', 전공='{user_profile.major_field}'")
+    logger.debug("[1. 기본 필터링] 사용자 프로필: 대학='%s', 학년='%s', 전공='%s'", profile.university_type, profile.academic_year_type, profile.major_field)
     current_filtered_qs = scholarships_queryset
+    user_univ_type = profile.university_type
+    user_academic_year = profile.academic_year_type
+    filter_values = _get_distinct_filter_values() if user_univ_type or user_academic_year else {}
     
-    # 대학 유형 필터링
-    if user_profile.university_type and user_profile.university_type.strip():
-        all_university_types = current_filtered_qs.values_list('university_type', flat=True).distinct()
-        user_univ_type_normalized = user_profile.university_type.strip().replace('-', '~')
-        matching_types = [db_type for db_type in all_university_types if user_univ_type_normalized in db_type.replace('-', '~')]
+    # 대학 유형 필터링 ('-'/'~' 표기 차이는 university_type_norm 컬럼에서 DB가 정규화)
+    # 캐시된 고유값에서 일치 항목을 먼저 찾고, 인덱스를 탈 수 있는 __in 조건으로 필터링합니다.
+    if user_univ_type:
+        user_univ_type_normalized = user_univ_type.replace('-', '~')
+        matching_types = [
+            db_type for db_type in filter_values[UNIVERSITY_TYPES_CACHE_KEY] if user_univ_type_normalized in db_type
+        ]
         if matching_types:
-            current_filtered_qs = current_filtered_qs.filter(university_type__in=matching_types)
+            current_filtered_qs = _filter_if_any_match(current_filtered_qs, Q(university_type_norm__in=matching_types))
     
-    # 학년 유형 필터링
-    if user_profile.academic_year_type and user_profile.academic_year_type.strip():
-        all_academic_years_in_db = current_filtered_qs.values_list('academic_year_type', flat=True).distinct()
-        user_academic_year_normalized = user_profile.academic_year_type.strip().replace(' ', '')
-        matching_academic_years = [db_year for db_year in all_academic_years_in_db if user_academic_year_normalized in db_year.replace(' ', '')]
+    # 학년 유형 필터링 (공백 차이는 academic_year_type_norm 컬럼에서 DB가 정규화)
+    if user_academic_year:
+        user_academic_year_normalized = user_academic_year.replace(' ', '')
+        matching_academic_years = [
+            db_year for db_year in filter_values[ACADEMIC_YEARS_CACHE_KEY] if user_academic_year_normalized in db_year
+        ]
         if matching_academic_years:
-            current_filtered_qs = current_filtered_qs.filter(academic_year_type__in=matching_academic_years)
+            current_filtered_qs = _filter_if_any_match(
+                current_filtered_qs, Q(academic_year_type_norm__in=matching_academic_years)
+            )
             
     # 학과(전공) 필터링
-    user_major_field = getattr(user_profile, 'major_field', None)
-    if user_major_field and user_major_field.strip():
-        all_majors_in_db = current_filtered_qs.values_list('major_field', flat=True).distinct()
-        user_major_normalized = user_major_field.strip()
+    if profile.major_field:
+        user_major_normalized = profile.major_field
         all_major_keywords = ["해당없음", "제한없음", "전공무관", "특정학과"] # '특정학과' 제외
         q_objects = Q(major_field__icontains=user_major_normalized) | Q(major_field__in=all_major_keywords)
         current_filtered_qs = current_filtered_qs.filter(q_objects)
 
-    print(f"DEBUG: [1. 기본 필터링] 최종 기본 필터링 적용 후 장학금 수: {current_filtered_qs.count()}")
+    count_logger.debug("[1. 기본 필터링] 최종 기본 필터링 적용 후 장학금 수: %s", _LazyCount(current_filtered_qs))
     return current_filtered_qs
 
-def filter_by_region_preprocessed(scholarships_queryset: QuerySet, user_profile: UserScholarship) -> QuerySet:
+def filter_by_region_preprocessed(scholarships_queryset: QuerySet, profile: NormalizedProfile) -> QuerySet:
     """사용자의 지역 정보와 정확히 일치하거나, 상위 지역, '전국'인 경우만 필터링합니다."""
-    user_region_do = getattr(user_profile, 'region', '') or ""
-    user_district = getattr(user_profile, 'district', '') or ""
-    
-    user_region_parts = list(filter(None, [user_region_do.strip(), user_district.strip()]))
-    full_user_region = ' '.join(user_region_parts)
-    print(f"DEBUG: [2. 지역 필터링] 조합된 사용자 지역: '{full_user_region}'")
+    user_region_parts = profile.region_parts
+    full_user_region = profile.full_region
+    logger.debug("[2. 지역 필터링] 조합된 사용자 지역: '%s'", full_user_region)
 
     if not full_user_region:
-        return scholarships_queryset.filter(region__icontains="전국")
+        return scholarships_queryset.filter(is_nationwide=True)
 
     exact_match_conditions = [full_user_region] + user_region_parts
-    q_objects = Q(region__in=exact_match_conditions) | Q(region__icontains="전국")
+    q_objects = Q(region__in=exact_match_conditions) | Q(is_nationwide=True)
     
-    filtered_qs = scholarships_queryset.filter(q_objects).distinct()
-    print(f"DEBUG: [2. 지역 필터링] 필터링 후 장학금 수: {filtered_qs.count()}")
+    # 조인이 없는 단일 테이블 조건이라 행이 중복될 수 없으므로 DISTINCT는 붙이지 않습니다.
+    filtered_qs = scholarships_queryset.filter(q_objects)
+    count_logger.debug("[2. 지역 필터링] 필터링 후 장학금 수: %s", _LazyCount(filtered_qs))
     return filtered_qs
 
 
 # --- 2단계: GPT 최종 랭킹 함수 --- 
 
-def recommend_final_scholarships_by_gpt(filtered_scholarships_queryset: QuerySet, user_profile: UserScholarship) -> QuerySet:
+def _build_score_annotation(profile: NormalizedProfile) -> Case:
+    """사용자 지역/전공과의 일치 정도로 점수제 샘플링에 쓰일 relevance_score 식을 만듭니다."""
+    full_user_region = profile.full_region
+    user_region_do = profile.region_do
+    user_major = profile.major_field
+
+    # 비어 있는 사용자 값은 모든 행(또는 지역 미기재 행)과 일치해 점수를 구분하지 못하므로 해당 분기를 만들지 않습니다.
+    # (특히 빈 전공의 LIKE '%%' 비교를 행마다 평가하지 않게 됩니다.)
+    score_branches = []
+    if full_user_region:
+        score_branches.append(When(region=full_user_region, then=Value(10)))
+    if user_region_do:
+        # region_do는 단일 지역 장학금에만 채워지므로, 사용자 시/도가 비어 있으면 비교하지 않습니다.
+        score_branches.append(When(region_do=user_region_do, then=Value(7)))
+    if user_major:
+        score_branches.append(When(major_field__icontains=user_major, then=Value(5)))
+    score_branches.append(When(is_nationwide=True, then=Value(1)))
+    return Case(*score_branches, default=Value(0), output_field=models.IntegerField())
+
+def build_candidate_queryset(
+    user_profile: UserScholarship | NormalizedProfile, scholarships_queryset: QuerySet | None = None
+) -> QuerySet:
+    """
+    기본 자격/지역 필터와 relevance_score 점수식을 하나의 QuerySet으로 합칩니다.
+    각 단계는 조건만 덧붙이므로, 결과를 평가할 때 WHERE + CASE + ORDER BY가 담긴 SELECT 한 번으로 실행됩니다.
+    """
+    profile = normalize_profile(user_profile)
+    if scholarships_queryset is None:
+        scholarships_queryset = Scholarship.objects.all()
+    scholarships = filter_basic(scholarships_queryset, profile) # 기본 자격 필터링
+    scholarships = filter_by_region_preprocessed(scholarships, profile) # 지역 자격 필터링
+    return scholarships.annotate(
+        relevance_score=_build_score_annotation(profile)
+    ).order_by('-relevance_score')
+
+def _prepare_gpt_candidates(scored_queryset: QuerySet, profile: NormalizedProfile):
+    """
+    점수제 샘플링으로 GPT 분석 대상 후보군을 고릅니다. (scored_queryset은 build_candidate_queryset의 결과)
+    (샘플 ID 목록, GPT 전달용 장학금 딕셔너리 목록, 사용자 정보)를 반환하며,
+    후보가 하나도 없으면 샘플 목록이 비어 있습니다.
+    """
+    # 슬라이스를 바로 한 번만 실행합니다. (후보가 30개보다 적으면 있는 만큼만 반환되므로 COUNT가 필요 없음)
+    sampled_scholarships_for_gpt = list(scored_queryset.values(*GPT_SCHOLARSHIP_FIELDS)[:GPT_SAMPLE_SIZE])
+    
+    logger.debug("[3. GPT 최종 추천] 점수제 샘플링 후 GPT 분석 대상 수: %s", len(sampled_scholarships_for_gpt))
+    sampled_ids = [s["product_id"] for s in sampled_scholarships_for_gpt]
+    return sampled_ids, sampled_scholarships_for_gpt, profile.info_dict
+
+def _iter_valid_recommendations(items, sampled_ids):
     """
-    GPT에게 최종 추천 이유까지 작성하도록 위임하고, 백엔드는 최소한의 검증(ID 유효성)만 수행하여
-    GPT의 추론 능력을 최대한 활용합니다.
+    GPT가 반환한 ID가 유효한지(샘플링 후보군에 있는지) 최소한의 검증만 수행하며, 통과한 항목을 하나씩 내보냅니다.
+    (Structured Outputs의 enum이 환각 ID를 막지만, 캐시 값과 스키마를 지키지 않는 호환 서버 응답을 위해 유지합니다.)
     """
-    print(f"DEBUG: [3. GPT 최종 추천] GPT 호출 전 후보군 수: {filtered_scholarships_queryset.count()}")
-    if filtered_scholarships_queryset.count() == 0:
-        return Scholarship.objects.none()
+    seen_ids = set()
+    for item in items:
+        if isinstance(item, dict) and 'product_id' in item and item['product_id'] in sampled_ids:
+            if item['product_id'] in seen_ids:
+                continue  # 같은 장학금을 중복 추천한 경우 첫 항목만 사용
+            seen_ids.add(item['product_id'])
+            logger.debug("  - ✅ 검증 성공 (ID 유효): %s, 이유: %s", item['product_id'], item.get('reason'))
+            yield item
+        else:
+            logger.debug("  - ❌ 검증 실패 (ID 오류 또는 환각): %s", item.get('product_id') if isinstance(item, dict) else item)
 
-    # --- 1. 점수제 샘플링 ---
-    user_region_do = getattr(user_profile, 'region', '') or ""
-    user_district = getattr(user_profile, 'district', '') or ""
-    full_user_region = ' '.join(filter(None, [user_region_do.strip(), user_district.strip()]))
-    user_major = getattr(user_profile, 'major_field', '') or ""
+def _recommendation_items(parsed_response) -> list:
+    """{"recommendations": [...]} 객체(Structured Outputs)와 항목 배열(캐시 값) 모두에서 항목 목록을 꺼냅니다."""
+    if isinstance(parsed_response, dict):
+        parsed_response = parsed_response.get('recommendations')
+    return parsed_response if isinstance(parsed_response, list) else []
 
-    score_annotation = Case(
-        When(region=full_user_region, then=Value(10)),
-        When(region=user_region_do, then=Value(7)),
-        When(major_field__icontains=user_major, then=Value(5)),
-        When(region__icontains="전국", then=Value(1)),
-        default=Value(0),
-        output_field=models.IntegerField()
+def _validate_recommendations(parsed_response, sampled_ids) -> list:
+    """파싱이 끝난 GPT 응답에서 검증을 통과한 상위 5개 항목을 반환합니다."""
+    parsed_response = _recommendation_items(parsed_response)
+    if not parsed_response:
+        return []
+    logger.debug("%s GPT 응답 최소 검증 시작 %s", "="*25, "="*25)
+    valid_recommendations = list(islice(_iter_valid_recommendations(parsed_response, sampled_ids), 5))
+    logger.debug("%s GPT 응답 최소 검증 완료 %s", "="*25, "="*25)
+    return valid_recommendations
+
+def iter_gpt_recommendations(user_info_dict: dict, sampled_scholarships_for_gpt: list, sampled_ids):
+    """
+    검증을 통과한 추천 항목({product_id})을 적합도 순으로 하나씩 내보냅니다.
+    캐시에 없으면 압축 필드만 담은 후보로 순위 규칙(RANKING_SYSTEM_RULES)에 따라 GPT를 한 번만 스트리밍 호출합니다. 각 항목은 완성되는
+    즉시 검증해 전달하고 5개가 모이면 나머지 생성은 기다리지 않습니다.
+    5개가 모였거나 스트림이 정상 종료된 결과만 캐시에 저장하며, 호출이 중간에 실패하면 받은 항목까지만 사용합니다.
+    """
+    cached_response, semantic_state = _lookup_cached_response(user_info_dict, sampled_ids)
+    if cached_response:
+        yield from _validate_recommendations(safe_parse_json(cached_response), sampled_ids)
+        return
+
+    logger.debug("%s GPT 스트리밍 응답 검증 시작 %s", "="*25, "="*25)
+    valid_recommendations = []
+    stream = call_gpt_stream(
+        _build_recommendation_prompt(user_info_dict, sampled_scholarships_for_gpt), RANKING_SYSTEM_RULES,
+        model=settings.OPENAI_RANKING_MODEL,
+        api_base=settings.OPENAI_RANKING_API_BASE, api_key=settings.OPENAI_RANKING_API_KEY,
+        response_format=_recommendation_response_format(sampled_ids, with_reason=False),
     )
-    
-    scored_queryset = filtered_scholarships_queryset.annotate(
-        relevance_score=score_annotation
-    ).order_by('-relevance_score')
+    try:
+        for item in islice(_iter_valid_recommendations(iter_json_array_items(stream), sampled_ids), 5):
+            valid_recommendations.append(item)
+            yield item
+    except Exception:
+        # 오류 내용은 call_gpt_stream이 기록합니다. 끊긴 결과를 24시간 동안 재사용하지 않도록 캐시에 넣지 않습니다.
+        logger.warning("GPT 스트리밍이 중간에 실패해 받은 %s개 항목만 사용하고 캐시에 저장하지 않습니다.", len(valid_recommendations))
+        return
+    finally:
+        stream.close()  # 5개가 모였거나 소비가 중단되면 남은 스트리밍 응답을 기다리지 않고 닫습니다.
+    logger.debug("%s GPT 스트리밍 응답 검증 완료 %s", "="*25, "="*25)
 
-    sample_size = 30
-    actual_sample_size = min(scored_queryset.count(), sample_size)
-    sampled_queryset_for_gpt = scored_queryset[:actual_sample_size]
-    
-    print(f"DEBUG: [3. GPT 최종 추천] 점수제 샘플링 후 GPT 분석 대상 수: {len(sampled_queryset_for_gpt)}")
-    sampled_scholarships_for_gpt = [_scholarship_to_simplified_dict(s) for s in sampled_queryset_for_gpt]
-    
-    # --- 2. 새로운 프롬프트 준비 ---
-    user_info_dict = user_profile.to_dict()
-    user_info_dict['region'] = full_user_region
-    user_info_dict.pop('district', None)
-    
-    prompt = f"""
-    당신은 사용자의 프로필과 장학금 자격 조건을 비교하여, 개인화된 추천 메시지를 작성하는 AI 카피라이터입니다.
+    if valid_recommendations:
+        _store_cached_response(
+            user_info_dict, sampled_ids, _dumps(valid_recommendations), semantic_state
+        )
+
+def _final_product_ids(valid_recommendations: list, sampled_ids) -> list:
+    """검증을 통과한 추천의 ID를 GPT가 정한 순서대로 반환합니다. 통과 항목이 없으면 점수 순(샘플 순서) 상위 5개로 폴백합니다."""
+    if not valid_recommendations:
+        logger.warning("검증을 통과한 추천 항목이 없습니다. 점수 기반 폴백 로직을 실행합니다.")
+        return list(sampled_ids[:5])
+    return [item['product_id'] for item in valid_recommendations]
+
+def _without_empty_fields(data: dict) -> dict:
+    """프롬프트에 넣기 전에 값이 없는(None/빈 문자열) 필드를 뺍니다. 빈 항목은 정보 없이 토큰만 차지합니다."""
+    return {key: value for key, value in data.items() if value is not None and value != ""}
 
+def _build_recommendation_prompt(user_info_dict: dict, sampled_scholarships_for_gpt: list) -> str:
+    """단일 사용자용 user 메시지를 만듭니다. 고정 규칙은 system 메시지(RECOMMENDATION_SYSTEM_RULES)로 따로 보냅니다."""
+    return f"""
     [사용자 프로필]
-    {json.dumps(user_info_dict, ensure_ascii=False, indent=2)}
+    {_dumps(_without_empty_fields(user_info_dict))}
 
     [분석 대상 장학금 목록]
-    {json.dumps(sampled_scholarships_for_gpt, ensure_ascii=False, indent=2)}
+    {_dumps([_without_empty_fields(s) for s in sampled_scholarships_for_gpt])}
 
-    [업무 지시]
-    사용자 프로필과 장학금 목록을 분석하여, 가장 적합한 **상위 5개의 장학금**을 적합도 순으로 정렬하여 JSON 배열로 반환하세요.
+    위 {len(sampled_scholarships_for_gpt)}개 후보 중 상위 5개를 JSON으로 반환하세요.
+    """
 
-    **[매우 중요한 규칙]**
-    1.  **사실 기반 작성:** reason'을 작성할 때는 아래 규칙을 반드시 따르고, **규칙에 해당하는 내용만을 근거로** 사실에 기반하여 작성하세요. 절대 추측하거나 없는 내용을 지어내지 마세요.
-        규칙1.  **지역 조건:** 사용자의 지역('{user_info_dict.get("region")}')과 장학금의 'region'이 구체적으로 일치할수록 높은 점수를 주세요. '전국'은 그 다음입니다.
+def _single_flight_key(user_info_dict: dict, product_ids) -> str:
+    """
+    동시에 들어온 요청을 합칠 키입니다. 자유 서술 항목이 없으면 의미 캐시 키(자격 조건 값 + 성적 구간 + 후보군)를 써서
+    이름/생년월일만 다른 사용자끼리도 GPT 호출을 합치고, 있으면 응답이 달라질 수 있으므로 정확 일치 키를 씁니다.
+    """
+    if _profile_free_text(user_info_dict):
+        return _recommendation_cache_key(user_info_dict, product_ids)
+    return _semantic_cache_key(user_info_dict, product_ids)
 
-        규칙2.  **성적 조건:** 사용자의 성적(gpa_last_semester, gpa_overall)과 장학금의 'grade_criteria_details'를 비교하여, 기준을 충족하면 점수를 부여하세요.
+async def _single_flight(key: str, coroutine_function):
+    """key가 같은 작업이 진행 중이면 그 결과를 기다리고, 아니면 직접 실행한 뒤 결과를 대기 중인 요청들과 공유합니다."""
+    with _inflight_gpt_calls_lock:
+        future = _inflight_gpt_calls.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = concurrent.futures.Future()
+            _inflight_gpt_calls[key] = future
 
-        규칙3.  **소득 조건:** 사용자의 소득분위('income_level')와 장학금의 'income_criteria_details'를 비교하여, 기준에 부합하면 점수를 부여하세요. 
+    if not is_leader:
+        logger.debug("[3. GPT 최종 추천] 동일한 GPT 요청이 진행 중이어서 결과를 함께 기다립니다.")
+        return await asyncio.wrap_future(future)
 
-        규칙4.  **특정 자격 조건 (가산점 항목):**
-            - 만약 사용자의 'is_multi_cultural_family'가 True이고, 장학금 설명(주로 'specific_qualification_details')에 '다문화'라는 텍스트가 있으면 높은 가산점을 주세요.
-            - 만약 사용자의 'is_single_parent_family'가 True이고, 장학금의 'income_criteria_details'에 '한부모', '가정형편', '경제사정'라는 텍스트가 있으면 높은 가산점을 주세요.
-            - 만약 사용자의 'is_multiple_children_family'가 True이고, 장학금의'income_criteria_details'에 '다자녀'라는 텍스트가 있으면 높은 가산점을 주세요.
-            - 만약 사용자의 'is_national_merit'가 True이고, 장학금의'income_criteria_details'에 '국가유공자' 또는 '보훈'이라는 텍스트가 있으면 높은 가산점을 주세요.
+    try:
+        result = await coroutine_function()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_gpt_calls_lock:
+            _inflight_gpt_calls.pop(key, None)
 
-        규칙5.  **기타 조건:** 위 조건 외에도 사용자의 전공, 학년 등이 장학금의 조건과 일치하는지 종합적으로 고려하세요.
-        
-    2.  **구체적인 이유 제시:** 'reason'에는 왜 이 장학금이 사용자에게 적합한지, 어떤 조건(예: 지역, 성적, 소득, 특정 자격)이 어떻게 부합하는지 **구체적으로** 서술하세요.
+def _sample_candidate_rows(scored_queryset: QuerySet):
+    """
+    실시간 경로의 점수제 샘플링입니다. 샘플 장학금을 모델로 한 번만 불러와, 같은 행에서
+    GPT 전달용 딕셔너리와 최종 결과용 {product_id: 모델}을 함께 만듭니다. (응답 후 추가 조회 없음)
+    """
+    sampled_rows = list(scored_queryset.defer(*SAMPLE_DEFERRED_FIELDS)[:GPT_SAMPLE_SIZE])
+    logger.debug("[3. GPT 최종 추천] 점수제 샘플링 후 GPT 분석 대상 수: %s", len(sampled_rows))
+    return _split_sample_rows(sampled_rows)
 
-    **[출력 형식]**
-    - 각 항목은 'product_id'와 'reason' 두 개의 키를 가진 JSON 객체여야 합니다.
-    - 'reason'은 사용자에게 보여줄 최종 추천 사유(한국어 문자열)입니다. 만약 규칙4로 인해 가산점을 얻은 경우, 'reason'에 그와 관련된 내용을 반드시 서술하세요. 
-    - 'product_id'는 절대 변경하지 마세요.
+def _split_sample_rows(sampled_rows: list):
+    """점수 순 샘플 행으로 (순위 매기기용 압축 딕셔너리 목록, {product_id: 모델})을 만듭니다."""
+    sampled_scholarships_for_gpt = [{field: getattr(row, field) for field in GPT_RANKING_FIELDS} for row in sampled_rows]
+    return sampled_scholarships_for_gpt, {row.product_id: row for row in sampled_rows}
 
-    **[출력 예시]**
-    [
-      {{
-        "product_id": "장학금B_지자체B",
-        "reason": "거주하시는 '경기도 파주시' 지역 조건에 부합하며, 직전 학기 성적(4.1)이 요구 기준(3.5 이상)을 충족합니다."
-      }},
-      {{
-        "product_id": "장학금A_재단A",
-        "reason": "'다자녀 가정' 자격에 해당하며, '전국' 단위로 지원 가능하여 지역 제한이 없습니다."
-      }}
+def _candidate_cache_key(profile: NormalizedProfile) -> str:
+    """후보군을 결정하는 프로필 값(대학/학년/전공/지역)과 오늘 날짜로 후보 샘플 캐시 키를 만듭니다."""
+    filter_inputs = [
+        profile.university_type, profile.academic_year_type, profile.major_field, profile.region_do, profile.district
     ]
-    """
+    payload = _dumps([*filter_inputs, datetime.now().date().isoformat()])
+    return f"{CANDIDATE_CACHE_PREFIX}:" + hashlib.sha256(payload.encode()).hexdigest()
 
-    # --- 3. GPT 호출 및 결과 처리 (검증 로직 간소화) ---
-    gpt_response_content = call_gpt(prompt)
-    parsed_response = safe_parse_json(gpt_response_content)
+def _load_candidate_sample(profile: NormalizedProfile):
+    """
+    실시간 경로의 후보 샘플을 불러옵니다. (_sample_candidate_rows와 같은 형태로 반환)
+    같은 필터 조건의 점수순 샘플 ID가 캐시에 있으면 필터+점수 쿼리 대신 product_id 조회 한 번으로 행을 가져오고,
+    없으면 build_candidate_queryset으로 샘플링한 뒤 ID 목록을 캐시합니다.
+    """
+    cache_key = _candidate_cache_key(profile)
+    try:
+        cached_values = cache.get_many([CANDIDATE_CACHE_GENERATION_KEY, cache_key])
+    except Exception as e:
+        logger.warning("후보 샘플 캐시 조회 실패: %s", e)
+        cached_values = {}
+    generation = cached_values.get(CANDIDATE_CACHE_GENERATION_KEY, 0)
+    cached_entry = cached_values.get(cache_key)
+    if cached_entry and cached_entry["generation"] == generation:
+        sampled_ids = cached_entry["ids"]
+        rows_by_id = Scholarship.objects.defer(*SAMPLE_DEFERRED_FIELDS).in_bulk(sampled_ids, field_name='product_id')
+        logger.debug("[2~3. 후보 샘플] 캐시 적중, GPT 분석 대상 수: %s", len(rows_by_id))
+        return _split_sample_rows([rows_by_id[pid] for pid in sampled_ids if pid in rows_by_id])
 
-    if not isinstance(parsed_response, list) or not parsed_response:
-        # 폴백 시에는 점수 높은 순으로 반환
-        return scored_queryset[:min(scored_queryset.count(), 5)]
+    scholarships = Scholarship.objects.all()
+    # scholarships = filter_scholarships_by_date(scholarships) # 1. 날짜 필터링 (필요시 활성화)
+    candidates = build_candidate_queryset(profile, scholarships) # 2~3. 기본/지역 자격 필터링 + 점수 (단일 쿼리)
+    sample = _sample_candidate_rows(candidates)
+    try:
+        cache.set(cache_key, {"generation": generation, "ids": list(sample[1])}, CANDIDATE_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("후보 샘플 캐시 저장 실패: %s", e)
+    return sample
 
-    # GPT가 반환한 ID가 유효한지(샘플링 후보군에 있는지) 최소한의 검증만 수행
-    valid_recommendations = []
-    sampled_ids = [s.product_id for s in sampled_queryset_for_gpt]
+async def _recommend_from_sample(sample, profile: NormalizedProfile) -> list:
+    """
+    점수제 샘플(_sample_candidate_rows 형태)에 대해 GPT 단계를 실행합니다.
+    샘플 조회 한 번으로 결과 모델까지 확보하므로, GPT 응답 후에는 DB 조회 없이 결과를 만듭니다.
+    """
+    sampled_scholarships_for_gpt, scholarships_by_id = sample
+    if not sampled_scholarships_for_gpt:
+        return []
+    sampled_ids = list(scholarships_by_id)
+    if len(sampled_ids) <= GPT_SKIP_MAX_CANDIDATES:
+        logger.debug("[3. GPT 최종 추천] 후보가 %s개뿐이라 GPT 호출 없이 점수 순으로 반환합니다.", len(sampled_ids))
+        return list(scholarships_by_id.values())
+    user_info_dict = profile.info_dict
     
-    print("\n" + "="*25 + " GPT 응답 최소 검증 시작 " + "="*25)
-    for item in parsed_response:
-        if isinstance(item, dict) and 'product_id' in item and item['product_id'] in sampled_ids:
-            valid_recommendations.append(item)
-            print(f"  - ✅ 검증 성공 (ID 유효): {item['product_id']}, 이유: {item.get('reason')}")
-        else:
-            print(f"  - ❌ 검증 실패 (ID 오류 또는 환각): {item.get('product_id')}")
-    print("="*25 + " GPT 응답 최소 검증 완료 " + "="*25 + "\n")
+    # --- 2. GPT 호출 (이벤트 루프를 막지 않도록 별도 스레드에서 실행) ---
+    # 자격 조건이 같은 프로필/후보군의 GPT 단계가 이미 진행 중이면 그 결과를 함께 기다려 한 번만 호출합니다.
+    run_gpt_stage = sync_to_async(
+        lambda: list(iter_gpt_recommendations(user_info_dict, sampled_scholarships_for_gpt, sampled_ids)),
+        thread_sensitive=False,
+    )
+    valid_recommendations = await _single_flight(_single_flight_key(user_info_dict, sampled_ids), run_gpt_stage)
 
-    if not valid_recommendations:
-        print("경고: 검증을 통과한 추천 항목이 없습니다. 점수 기반 폴백 로직을 실행합니다.")
-        return scored_queryset[:min(scored_queryset.count(), 5)]
-    
-    # --- 4. 최종 결과 생성 ---
-    top_5_ids = [item['product_id'] for item in valid_recommendations[:5]]
-    
-    preserved_order = Case(*[When(product_id=pid, then=Value(i)) for i, pid in enumerate(top_5_ids)], default=Value(len(top_5_ids)))    
-    final_queryset = filtered_scholarships_queryset.filter(
-        product_id__in=top_5_ids
-    ).annotate(
-        relevance_score=score_annotation
-    ).order_by(preserved_order, '-relevance_score')
+    # --- 3. GPT가 정한 순서대로 결과 구성 (검증 통과 항목이 없으면 점수 순 상위 5개로 폴백) ---
+    final_ids = _final_product_ids(valid_recommendations, sampled_ids)
+    return [scholarships_by_id[pid] for pid in final_ids if pid in scholarships_by_id]
+
+
+# --- 다중 사용자 묶음 구성 ---
+@lru_cache(maxsize=1)
+def _get_token_encoder():
+    """추천 모델의 토크나이저입니다. (인코딩 파일을 받을 수 없는 환경이면 None)"""
+    try:
+        return tiktoken.encoding_for_model(settings.OPENAI_RECOMMENDATION_MODEL)
+    except Exception as e:
+        logger.warning("토크나이저 로드 실패, 글자 수로 토큰 수를 추정합니다: %s", e)
+        return None
+
+def _count_prompt_tokens(text: str) -> int:
+    encoder = _get_token_encoder()
+    return len(encoder.encode(text)) if encoder else len(text)  # 한글은 대체로 글자당 1토큰 이하
 
-    print(f"DEBUG: [4. GPT 최종 추천] 최종 반환될 장학금 수: {final_queryset.count()}")
-    return final_queryset
+def _group_users_for_gpt(pending: list) -> list:
+    """
+    GPT 호출 1회에 묶을 사용자 묶음과 그 프롬프트를 만듭니다. [(묶음, 프롬프트), ...]
+    묶음 크기는 RECOMMEND_MANY_USERS_PER_CALL명, 입력 토큰은 RECOMMEND_MANY_MAX_PROMPT_TOKENS 이하로 제한합니다.
+    """
+    token_budget = RECOMMEND_MANY_MAX_PROMPT_TOKENS - _count_prompt_tokens(BATCH_RECOMMENDATION_SYSTEM_RULES)
+    groups, group, blocks, group_tokens = [], [], [], 0
+
+    def _flush():
+        prompt = f"""
+    [사용자별 프로필 및 분석 대상 장학금 목록]
+    {{"users":[{','.join(blocks)}]}}
+    """
+        groups.append((group, prompt))
+
+    for ctx in pending:
+        # 사용자별 블록을 한 번만 직렬화/토큰화하고, 묶음 프롬프트는 블록을 이어 붙여 만듭니다.
+        block = _dumps({
+            "user_id": ctx["user_id"],
+            "profile": _without_empty_fields(ctx["user_info_dict"]),
+            "candidates": [_without_empty_fields(s) for s in ctx["candidates"]],
+        })
+        block_tokens = _count_prompt_tokens(block)
+        if group and (len(group) >= RECOMMEND_MANY_USERS_PER_CALL or group_tokens + block_tokens > token_budget):
+            _flush()
+            group, blocks, group_tokens = [], [], 0
+        group.append(ctx)
+        blocks.append(block)
+        group_tokens += block_tokens
+    if group:
+        _flush()
+    return groups
 
 
 # --- 총괄 지휘 함수 ---
-def recommend(user_id: int) -> QuerySet:
-    """주어진 사용자 ID에 대해 장학금을 추천하는 전체 프로세스를 실행합니다."""
-    print(f"DEBUG: [전체 프로세스 시작] 사용자 ID: {user_id}")
-    try:
-        user_profile = UserScholarship.objects.get(user_id=user_id)
-    except UserScholarship.DoesNotExist:
-        print(f"오류: 사용자 ID {user_id}에 해당하는 프로필을 찾을 수 없습니다.")
-        return Scholarship.objects.none()
+async def recommend_async(user_id: int, user_profile: UserScholarship | None = None) -> list:
+    """
+    주어진 사용자 ID에 대해 장학금을 추천하는 전체 프로세스를 실행합니다. (추천 장학금 모델 목록을 순서대로 반환)
+    호출 측에서 이미 조회한 프로필이 있으면 user_profile로 넘겨 같은 조회를 반복하지 않습니다.
+    """
+    logger.debug("[전체 프로세스 시작] 사용자 ID: %s", user_id)
+    if user_profile is None:
+        try:
+            user_profile = await sync_to_async(UserScholarship.objects.get)(user_id=user_id)
+        except UserScholarship.DoesNotExist:
+            logger.error("사용자 ID %s에 해당하는 프로필을 찾을 수 없습니다.", user_id)
+            return []
 
-    scholarships = Scholarship.objects.all()
-    # scholarships = filter_scholarships_by_date(scholarships) # 1. 날짜 필터링 (필요시 활성화)
-    scholarships = filter_basic(scholarships, user_profile) # 2. 기본 자격 필터링
-    scholarships = filter_by_region_preprocessed(scholarships, user_profile) # 3. 지역 자격 필터링
-    final_recommendations = recommend_final_scholarships_by_gpt(scholarships, user_profile) # 4. 최종 랭킹
+    profile = normalize_profile(user_profile) # 프로필 정규화는 요청당 한 번만
+    sample = await sync_to_async(_load_candidate_sample)(profile) # 1~3. 필터링 + 점수제 샘플링 (캐시 적중 시 ID 조회만)
+    final_recommendations = await _recommend_from_sample(sample, profile) # 4. 최종 랭킹
     
-    print(f"DEBUG: [전체 프로세스 완료] 최종 추천 장학금 수: {final_recommendations.count()}")
-    return final_recommendations
\ No newline at end of file
+    logger.debug("[전체 프로세스 완료] 최종 추천 장학금 수: %s", len(final_recommendations))
+    return final_recommendations
+
+def recommend(user_id: int, user_profile: UserScholarship | None = None) -> list:
+    """recommend_async의 동기 진입점입니다. (동기 뷰에서 호출)"""
+    return async_to_sync(recommend_async)(user_id, user_profile)
+
+def get_stored_recommendations(user_id: int) -> list:
+    """
+    Batch로 미리 계산해 둔 추천 장학금을 순위 순으로 반환합니다. (조회 1회)
+    STORED_RECOMMENDATION_MAX_AGE보다 오래된 결과는 쓰지 않으며, 없으면 빈 목록이므로 호출 측이 recommend()로 폴백합니다.
+    """
+    return list(
+        Scholarship.objects.filter(
+            recommendation__user_id=user_id,
+            recommendation__created_at__gte=timezone.now() - STORED_RECOMMENDATION_MAX_AGE,
+        ).order_by('recommendation__rank')
+    )
+
+async def arecommend_many(user_ids: list[int]) -> dict[int, list]:
+    """
+    여러 사용자의 실시간 추천(recommend_async)을 동시에 진행합니다. 반환값은 {user_id: 추천 장학금 목록} 입니다.
+    프로필은 한 번에 조회하고, 동시에 진행하는 사용자 수는 GPT_MAX_CONCURRENT_CALLS로 제한합니다.
+    (사용자를 한 프롬프트로 묶어 비용을 줄이는 일괄 경로는 recommend_many)
+    """
+    profiles = await sync_to_async(list)(UserScholarship.objects.filter(user_id__in=user_ids))
+    profiles_by_user = {profile.user_id: profile for profile in profiles}
+    semaphore = asyncio.Semaphore(GPT_MAX_CONCURRENT_CALLS)
+
+    async def _recommend_one(user_id: int) -> list:
+        if user_id not in profiles_by_user:
+            logger.error("사용자 ID %s에 해당하는 프로필을 찾을 수 없습니다.", user_id)
+            return []
+        async with semaphore:
+            return await recommend_async(user_id, profiles_by_user[user_id])
+
+    results = await asyncio.gather(*[_recommend_one(user_id) for user_id in user_ids])
+    return dict(zip(user_ids, results))
+
+
+def _prepare_user_candidates(user_profile: UserScholarship):
+    """실시간 추천과 같은 필터링/샘플링을 거쳐 사용자의 GPT 후보군을 준비합니다. 후보가 없으면 None."""
+    profile = normalize_profile(user_profile)
+    prepared = _prepare_gpt_candidates(build_candidate_queryset(profile), profile)
+    return prepared if prepared[0] else None
+
+def recommend_many(user_ids: list[int]) -> dict[int, list]:
+    """
+    여러 사용자의 추천을 한꺼번에 계산합니다. (야간 일괄 갱신 등 비대화형 경로용)
+    사용자 RECOMMEND_MANY_USERS_PER_CALL명(입력 토큰 상한 이내)을 하나의 프롬프트로 묶어 고정 규칙 블록 비용을 나누고,
+    묶음별 GPT 호출은 동시에 진행합니다. 반환값은 {user_id: 추천 장학금 목록} 입니다.
+    """
+    final_ids_by_user = {user_id: [] for user_id in user_ids}
+    pending = []
+
+    for user_profile in UserScholarship.objects.filter(user_id__in=user_ids):
+        prepared = _prepare_user_candidates(user_profile)
+        if prepared is None:
+            continue
+
+        sampled_ids, sampled_scholarships_for_gpt, user_info_dict = prepared
+        if len(sampled_ids) <= GPT_SKIP_MAX_CANDIDATES:
+            final_ids_by_user[user_profile.user_id] = sampled_ids  # 고를 것이 없으므로 점수 순 그대로
+            continue
+        cached_response = get_cached_recommendation(user_info_dict, sampled_ids)
+        if cached_response:
+            final_ids_by_user[user_profile.user_id] = _final_product_ids(
+                _validate_recommendations(safe_parse_json(cached_response), sampled_ids), sampled_ids
+            )
+            continue
+
+        pending.append({
+            "user_id": user_profile.user_id,
+            "user_info_dict": user_info_dict,
+            "sampled_ids": sampled_ids,
+            "candidates": sampled_scholarships_for_gpt,
+        })
+
+    grouped_prompts = _group_users_for_gpt(pending) if pending else []
+    prompts = [prompt for _, prompt in grouped_prompts]
+    response_formats = [_grouped_recommendation_response_format(group) for group, _ in grouped_prompts]
+    responses = asyncio.run(
+        _acall_gpt_many(prompts, BATCH_RECOMMENDATION_SYSTEM_RULES, response_formats)
+    ) if prompts else []
+
+    for (group, _), gpt_response_content in zip(grouped_prompts, responses):
+        recommendations_by_user = {}
+        parsed_response = safe_parse_json(gpt_response_content)
+        if isinstance(parsed_response, dict):
+            parsed_response = parsed_response.get('users')  # Structured Outputs 응답은 {"users": [...]} 객체
+        for entry in parsed_response if isinstance(parsed_response, list) else []:
+            try:
+                recommendations_by_user[int(entry['user_id'])] = entry.get('recommendations') or []
+            except (TypeError, KeyError, ValueError):
+                continue
+
+        for ctx in group:
+            recommendations = recommendations_by_user.get(ctx["user_id"], [])
+            if recommendations:
+                # 단건 추천(recommend)도 같은 결과를 재사용하도록 사용자별 캐시에 저장합니다.
+                set_cached_recommendation(
+                    ctx["user_info_dict"], ctx["sampled_ids"], _dumps(recommendations)
+                )
+            final_ids_by_user[ctx["user_id"]] = _final_product_ids(
+                _validate_recommendations(recommendations, ctx["sampled_ids"]), ctx["sampled_ids"]
+            )
+
+    # 모든 사용자의 결과 장학금은 한 번에 조회해 사용자마다 최종 쿼리를 다시 실행하지 않습니다.
+    scholarships_by_id = Scholarship.objects.in_bulk(
+        {pid for final_ids in final_ids_by_user.values() for pid in final_ids}, field_name='product_id'
+    )
+    return {
+        user_id: [scholarships_by_id[pid] for pid in final_ids if pid in scholarships_by_id]
+        for user_id, final_ids in final_ids_by_user.items()
+    }
+
+
+# --- 비대화형 일괄 추천 (OpenAI Batch API) ---
+def _profile_fingerprint(user_info_dict: dict) -> str:
+    """프롬프트에 들어가는 사용자 정보의 해시입니다. Batch 제출 이후 프로필이 바뀌었는지 수집 시점에 확인합니다."""
+    return hashlib.sha256(_dumps_sorted(user_info_dict)).hexdigest()[:16]
+
+def recommend_batch_submit(user_ids: list[int]) -> str | None:
+    """
+    사용자별 추천 프롬프트를 JSONL 파일로 만들어 OpenAI Batch API에 제출하고 batch_id를 반환합니다.
+    결과는 최대 24시간 뒤 recommend_batch_collect(batch_id)로 수집합니다.
+    custom_id는 '<user_id>:<프로필 해시>'이며, 수집 시점에 프로필이 바뀐 사용자의 결과는 저장하지 않습니다.
+    """
+    lines = []
+    for user_profile in UserScholarship.objects.filter(user_id__in=user_ids):
+        prepared = _prepare_user_candidates(user_profile)
+        if prepared is None:
+            continue
+        _, sampled_scholarships_for_gpt, user_info_dict = prepared
+        lines.append(_dumps({
+            "custom_id": f"{user_profile.user_id}:{_profile_fingerprint(user_info_dict)}",
+            "method": "POST",
+            "url": BATCH_API_ENDPOINT,
+            "body": _gpt_request_body(
+                _build_recommendation_prompt(user_info_dict, sampled_scholarships_for_gpt),
+                response_format=_recommendation_response_format([s["product_id"] for s in sampled_scholarships_for_gpt]),
+            ),
+        }))
+
+    if not lines:
+        logger.debug("[Batch 추천] 제출할 사용자가 없습니다.")
+        return None
+
+    input_file = openai.File.create(
+        file=io.BytesIO("\n".join(lines).encode("utf-8")),
+        purpose="batch",
+        user_provided_filename="recommendations.jsonl",
+    )
+    # openai 0.28 SDK에는 Batch 리소스가 없어 공용 요청기로 /batches 엔드포인트를 직접 호출합니다.
+    response, _, _ = openai.api_requestor.APIRequestor().request("post", "/batches", params={
+        "input_file_id": input_file["id"],
+        "endpoint": BATCH_API_ENDPOINT,
+        "completion_window": BATCH_API_COMPLETION_WINDOW,
+    })
+    batch_id = response.data["id"]
+    logger.debug("[Batch 추천] %s명 제출 완료. batch_id=%s", len(lines), batch_id)
+    return batch_id
+
+def recommend_batch_collect(batch_id: str) -> str:
+    """
+    Batch 상태를 확인하고, 완료되었으면 결과 파일을 내려받아 사용자별 추천을 Recommendation 테이블에 저장합니다.
+    Batch 상태 문자열(completed, in_progress, failed 등)을 반환하며, 완료되었지만 결과 파일이 없으면
+    (모든 요청 실패) BATCH_NO_OUTPUT_STATUS를 반환합니다.
+    """
+    response, _, _ = openai.api_requestor.APIRequestor().request("get", f"/batches/{batch_id}")
+    batch = response.data
+    if batch["status"] != "completed":
+        logger.debug("[Batch 추천] batch_id=%s 상태: %s", batch_id, batch['status'])
+        return batch["status"]
+    if not batch.get("output_file_id"):
+        logger.error(
+            "[Batch 추천] batch_id=%s 완료되었지만 결과 파일이 없습니다. (모든 요청 실패, error_file_id=%s)",
+            batch_id, batch.get("error_file_id"),
+        )
+        return BATCH_NO_OUTPUT_STATUS
+
+    output = openai.File.download(batch["output_file_id"]).decode("utf-8")
+    contents_by_user = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        body = (result.get("response") or {}).get("body") or {}
+        if not body.get("choices"):
+            logger.warning("[Batch 추천] 사용자 %s 요청 실패: %s", result.get('custom_id'), result.get('error'))
+            continue
+        try:
+            user_id, _, fingerprint = result["custom_id"].partition(":")
+            contents_by_user[int(user_id)] = (fingerprint, body["choices"][0]["message"]["content"])
+        except (KeyError, ValueError):
+            continue
+
+    # 사용자 프로필은 한 번에 조회합니다. (UserScholarship의 PK는 user_id)
+    profiles = UserScholarship.objects.in_bulk(list(contents_by_user))
+    valid_by_user = {}
+    for user_id, (fingerprint, content) in contents_by_user.items():
+        user_profile = profiles.get(user_id)
+        if user_profile is None:
+            continue
+        profile = normalize_profile(user_profile)
+        if fingerprint != _profile_fingerprint(profile.info_dict):
+            # 제출 이후 프로필이 바뀐 사용자는 이전 프로필 기준 결과를 저장하지 않습니다. (다음 조회 때 실시간 추천)
+            logger.debug("[Batch 추천] 사용자 %s의 프로필이 제출 이후 바뀌어 결과를 건너뜁니다.", user_id)
+            continue
+        # 제출 이후 장학금 데이터가 바뀌었을 수 있으므로 현재 후보군 기준으로 다시 검증합니다.
+        # 검증에는 ID만 필요하므로 샘플 컬럼 전체 대신 product_id 한 컬럼만 조회합니다.
+        sampled_ids = list(
+            build_candidate_queryset(profile).values_list('product_id', flat=True)[:GPT_SAMPLE_SIZE]
+        )
+        if not sampled_ids:
+            continue
+        valid_by_user[user_id] = _validate_recommendations(safe_parse_json(content), sampled_ids)
+
+    scholarships_by_id = Scholarship.objects.in_bulk(
+        {item['product_id'] for items in valid_by_user.values() for item in items}, field_name='product_id'
+    )
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id__in=list(valid_by_user)).delete()
+        Recommendation.objects.bulk_create([
+            Recommendation(
+                user_id=user_id,
+                scholarship=scholarships_by_id[item['product_id']],
+                rank=rank,
+                reason=item.get('reason') or "",
+                batch_id=batch_id,
+            )
+            for user_id, items in valid_by_user.items()
+            for rank, item in enumerate(items, start=1)
+        ])
+
+    logger.debug("[Batch 추천] batch_id=%s 결과 저장 완료: %s명", batch_id, len(valid_by_user))
+    return batch["status"]
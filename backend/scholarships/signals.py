@@ -0,0 +1,19 @@
+# scholarships/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Scholarship, Recommendation
+from userinfor.models import UserScholarship
+from .recommendation import invalidate_scholarship_filter_cache
+
+
+@receiver(post_save, sender=Scholarship)
+@receiver(post_delete, sender=Scholarship)
+def clear_scholarship_filter_cache(sender, **kwargs):
+    """장학금이 추가/수정/삭제되면 추천 필터링에 쓰는 속성 캐시와 후보 샘플 캐시를 무효화합니다."""
+    invalidate_scholarship_filter_cache()
+
+
+@receiver(post_save, sender=UserScholarship)
+def clear_stored_recommendations(sender, instance, **kwargs):
+    """프로필이 저장되면 이전 프로필 기준으로 계산된 추천(Recommendation)을 지워, 다음 조회부터 실시간 추천을 사용합니다."""
+    Recommendation.objects.filter(user_id=instance.user_id).delete()
@@ -1,3 +1,299 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import openai
+import orjson
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from userinfor.models import UserScholarship
+from . import recommendation
+from .models import Recommendation, Scholarship, parse_region_fields
+from .recommendation import extract_json_from_gpt_response, iter_json_array_items, safe_parse_json
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _chunks(text, size=3):
+    """스트리밍 응답처럼 text를 size 글자씩 잘라 내보냅니다."""
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+class IterJsonArrayItemsTests(SimpleTestCase):
+    def test_escaped_quotes(self):
+        text = '[{"product_id": "P1", "reason": "\\"전국\\" 대상 \\\\ 장학금"}]'
+        self.assertEqual(
+            list(iter_json_array_items(_chunks(text))),
+            [{"product_id": "P1", "reason": '"전국" 대상 \\ 장학금'}],
+        )
+
+    def test_brackets_inside_strings(self):
+        text = '[{"product_id": "P1", "reason": "[참고] {소득} ]}"}, {"product_id": "P2"}]'
+        self.assertEqual(
+            [item["product_id"] for item in iter_json_array_items(_chunks(text))],
+            ["P1", "P2"],
+        )
+
+    def test_object_wrapped_stream(self):
+        text = '다음은 "추천" 결과입니다. {"recommendations": [{"product_id": "P1", "tags": [1, 2]}, {"product_id": "P2"}]}'
+        self.assertEqual(
+            list(iter_json_array_items(_chunks(text, 1))),
+            [{"product_id": "P1", "tags": [1, 2]}, {"product_id": "P2"}],
+        )
+
+    def test_truncated_tail_is_not_emitted(self):
+        text = '{"recommendations": [{"product_id": "P1"}, {"product_id": "P2", "reason": "소득'
+        self.assertEqual(list(iter_json_array_items(_chunks(text))), [{"product_id": "P1"}])
+
+
+class ExtractJsonTests(SimpleTestCase):
+    def test_skips_unparsable_prose_brackets(self):
+        text = '설명 [참고] 이후 [{"product_id":"P1"}]'
+        self.assertEqual(extract_json_from_gpt_response(text), '[{"product_id":"P1"}]')
+        self.assertEqual(safe_parse_json(text), [{"product_id": "P1"}])
+
+    def test_skips_invalid_span_without_returning_its_items(self):
+        text = '초안 [{"product_id":"P0"},] 최종 {"recommendations": [{"product_id":"P1"}]}'
+        self.assertEqual(safe_parse_json(text), {"recommendations": [{"product_id": "P1"}]})
+
+    def test_brackets_inside_strings(self):
+        text = '결과: {"recommendations": [{"product_id": "P1", "reason": "]} \\" ["}]} 끝'
+        self.assertEqual(
+            safe_parse_json(text),
+            {"recommendations": [{"product_id": "P1", "reason": ']} " ['}]},
+        )
+
+    def test_truncated_response(self):
+        text = '결과: [{"product_id": "P1"}, {"product_id": "P2"'
+        self.assertEqual(extract_json_from_gpt_response(text), "[]")
+        self.assertEqual(safe_parse_json(text), [])
+
+    def test_empty_response(self):
+        self.assertEqual(safe_parse_json(""), [])
+        self.assertEqual(safe_parse_json(None), [])
+
+
+def _make_scholarship(product_id, **fields):
+    defaults = {
+        "name": f"장학금 {product_id}",
+        "product_type": "장학금",
+        "university_type": "4년제(5-6년제포함)",
+        "academic_year_type": "대학 1학기~대학 8학기",
+        "major_field": "제한없음",
+        "region": "전국",
+        "is_region_processed": True,
+    }
+    defaults.update(fields)
+    return Scholarship.objects.create(product_id=product_id, **defaults)
+
+
+def _make_profile(username, **fields):
+    defaults = {"region": "경기도", "district": "파주시", "university_type": "4년제", "major_field": "컴퓨터공학"}
+    defaults.update(fields)
+    return UserScholarship.objects.create(user=User.objects.create(username=username), **defaults)
+
+
+class FilterBasicTests(TestCase):
+    def setUp(self):
+        _make_scholarship("UNIV4")
+        _make_scholarship("COLLEGE", university_type="전문대(2~3년제)")
+
+    def test_filters_by_normalized_university_type(self):
+        profile = recommendation.normalize_profile(UserScholarship(university_type="4년제"))
+        filtered = recommendation.filter_basic(Scholarship.objects.all(), profile)
+        self.assertEqual([s.product_id for s in filtered], ["UNIV4"])
+
+    def test_skips_filter_when_nothing_in_queryset_matches(self):
+        queryset = Scholarship.objects.filter(product_id="COLLEGE")
+        filtered = recommendation._filter_if_any_match(queryset, Q(university_type_norm="4년제(5~6년제포함)"))
+        self.assertEqual([s.product_id for s in filtered], ["COLLEGE"])
+
+
+class RegionFieldsTests(TestCase):
+    def test_parse_region_fields(self):
+        self.assertEqual(parse_region_fields("전국"), (True, ""))
+        self.assertEqual(parse_region_fields("경기도 파주시"), (False, "경기도"))
+        self.assertEqual(parse_region_fields("강원도,경기도"), (False, ""))
+        self.assertEqual(parse_region_fields(None), (False, ""))
+
+    def test_save_with_update_fields_refreshes_derived_columns(self):
+        scholarship = _make_scholarship("S1", region="경기도 파주시")
+        scholarship.region = "전국"
+        scholarship.save(update_fields=["region"])
+        scholarship.refresh_from_db()
+        self.assertTrue(scholarship.is_nationwide)
+        self.assertEqual(scholarship.region_do, "")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SemanticCacheTests(SimpleTestCase):
+    product_ids = ["P1", "P2", "P3"]
+    base_info = {
+        "name": "홍길동", "birth_date": "2001-01-01", "region": "경기도 파주시", "income_level": "3분위",
+        "university_type": "4년제", "academic_year_type": "대학 3학기", "major_field": "컴퓨터공학",
+        "gpa_last_semester": 3.6, "gpa_overall": 3.6, "additional_info": "",
+    }
+
+    def setUp(self):
+        recommendation.cache.clear()
+
+    def _store(self, info, response_text, embedding=None):
+        recommendation._store_cached_response(info, self.product_ids, response_text, (embedding, []))
+
+    def _lookup(self, info):
+        return recommendation._lookup_cached_response(info, self.product_ids)[0]
+
+    def test_exact_hit(self):
+        self._store(self.base_info, "cached")
+        self.assertEqual(self._lookup(dict(self.base_info)), "cached")
+
+    def test_shared_across_profiles_with_same_eligibility(self):
+        self._store(self.base_info, "cached")
+        self.assertEqual(self._lookup({**self.base_info, "name": "김철수", "birth_date": "1999-09-09"}), "cached")
+        self.assertEqual(self._lookup({**self.base_info, "gpa_overall": 3.9}), "cached")
+
+    def test_eligibility_or_gpa_band_change_misses(self):
+        self._store(self.base_info, "cached")
+        self.assertIsNone(self._lookup({**self.base_info, "income_level": "8분위"}))
+        self.assertIsNone(self._lookup({**self.base_info, "gpa_overall": 3.4}))
+
+    def test_free_text_matches_by_embedding(self):
+        embeddings = {"봉사활동 많음": [1.0, 0.0], "봉사 활동이 많음": [1.0, 0.01], "창업 경험": [0.0, 1.0]}
+        with mock.patch.object(recommendation, "_get_free_text_embedding", side_effect=embeddings.get):
+            self._store({**self.base_info, "additional_info": "봉사활동 많음"}, "cached", embedding=[1.0, 0.0])
+            self.assertEqual(self._lookup({**self.base_info, "additional_info": "봉사 활동이 많음"}), "cached")
+            self.assertIsNone(self._lookup({**self.base_info, "additional_info": "창업 경험"}))
+            self.assertIsNone(self._lookup(self.base_info))  # 자유 서술이 없는 요청은 임베딩 항목과 섞지 않음
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RealtimeStreamTests(SimpleTestCase):
+    def setUp(self):
+        recommendation.cache.clear()
+
+    def test_partial_stream_is_not_cached(self):
+        def failing_stream(**kwargs):
+            yield {"choices": [{"delta": {"content": '{"recommendations":[{"product_id":"P1"},{"product_id":"P2"},'}}]}
+            raise openai.error.APIConnectionError("connection reset")
+
+        info = {"region": "경기도", "additional_info": ""}
+        sampled = [{"product_id": f"P{i}"} for i in range(1, 8)]
+        sampled_ids = [s["product_id"] for s in sampled]
+        with mock.patch("openai.ChatCompletion.create", side_effect=failing_stream):
+            items = list(recommendation.iter_gpt_recommendations(info, sampled, sampled_ids))
+        self.assertEqual([item["product_id"] for item in items], ["P1", "P2"])
+        self.assertIsNone(recommendation._lookup_cached_response(info, sampled_ids)[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CandidateCacheTests(TestCase):
+    def setUp(self):
+        recommendation.cache.clear()
+        for i in range(3):
+            _make_scholarship(f"S{i}")
+        self.profile = recommendation.normalize_profile(UserScholarship(user_id=1, university_type="4년제"))
+
+    def test_second_load_uses_cached_ids(self):
+        first = recommendation._load_candidate_sample(self.profile)
+        with self.assertNumQueries(1):
+            second = recommendation._load_candidate_sample(self.profile)
+        self.assertEqual(list(second[1]), list(first[1]))
+
+    def test_scholarship_save_invalidates_cached_sample(self):
+        recommendation._load_candidate_sample(self.profile)
+        _make_scholarship("NEW")
+        self.assertIn("NEW", recommendation._load_candidate_sample(self.profile)[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchCollectTests(TestCase):
+    def setUp(self):
+        recommendation.cache.clear()
+        for i in range(3):
+            _make_scholarship(f"S{i}")
+        self.profile = _make_profile("u1")
+
+    def _custom_id(self, user_profile):
+        info = recommendation.normalize_profile(user_profile).info_dict
+        return f"{user_profile.user_id}:{recommendation._profile_fingerprint(info)}"
+
+    def _collect(self, batch, lines):
+        output = "\n".join(orjson.dumps(line).decode() for line in lines).encode()
+        requestor = mock.Mock()
+        requestor.request.return_value = (SimpleNamespace(data=batch), False, "key")
+        with mock.patch("openai.api_requestor.APIRequestor", return_value=requestor), \
+                mock.patch("openai.File.download", return_value=output):
+            return recommendation.recommend_batch_collect(batch["id"])
+
+    def _line(self, custom_id, items):
+        content = orjson.dumps({"recommendations": items}).decode()
+        return {"custom_id": custom_id, "response": {"body": {"choices": [{"message": {"content": content}}]}}}
+
+    def test_stores_validated_recommendations(self):
+        items = [
+            {"product_id": "S2", "reason": "전국 단위"},
+            {"product_id": "FAKE", "reason": "환각"},
+            {"product_id": "S0", "reason": "전공 무관"},
+        ]
+        status = self._collect(
+            {"id": "b1", "status": "completed", "output_file_id": "file-out"},
+            [self._line(self._custom_id(self.profile), items)],
+        )
+        self.assertEqual(status, "completed")
+        self.assertEqual(
+            list(Recommendation.objects.values_list("rank", "scholarship__product_id", "reason", "batch_id")),
+            [(1, "S2", "전국 단위", "b1"), (2, "S0", "전공 무관", "b1")],
+        )
+
+    def test_skips_users_whose_profile_changed_after_submit(self):
+        custom_id = self._custom_id(self.profile)
+        self.profile.major_field = "경영학"
+        self.profile.save()
+        self._collect(
+            {"id": "b1", "status": "completed", "output_file_id": "file-out"},
+            [self._line(custom_id, [{"product_id": "S0", "reason": "이전 프로필"}])],
+        )
+        self.assertFalse(Recommendation.objects.exists())
+
+    def test_completed_without_output_file_is_reported(self):
+        status = self._collect({"id": "b1", "status": "completed", "error_file_id": "file-err"}, [])
+        self.assertEqual(status, recommendation.BATCH_NO_OUTPUT_STATUS)
+        self.assertFalse(Recommendation.objects.exists())
+
+
+class GroupUsersForGptTests(SimpleTestCase):
+    def _ctx(self, user_id):
+        return {
+            "user_id": user_id,
+            "user_info_dict": {"region": "경기도"},
+            "candidates": [{"product_id": f"P{user_id}", "grade_criteria_details": "평점 3.0 이상 " * 50}],
+        }
+
+    def _group_sizes(self, pending, max_prompt_tokens):
+        with mock.patch.object(recommendation, "_count_prompt_tokens", side_effect=len), \
+                mock.patch.object(recommendation, "RECOMMEND_MANY_MAX_PROMPT_TOKENS", max_prompt_tokens):
+            return [len(group) for group, _ in recommendation._group_users_for_gpt(pending)]
+
+    def _single_prompt_tokens(self):
+        with mock.patch.object(recommendation, "_count_prompt_tokens", side_effect=len):
+            return len(recommendation._group_users_for_gpt([self._ctx(0)])[0][1])
+
+    def test_limits_users_per_call(self):
+        pending = [self._ctx(i) for i in range(7)]
+        self.assertEqual(self._group_sizes(pending, 10**9), [5, 2])
+
+    def test_limits_prompt_tokens(self):
+        rules_tokens = len(recommendation.BATCH_RECOMMENDATION_SYSTEM_RULES)
+        pending = [self._ctx(i) for i in range(5)]
+        self.assertEqual(self._group_sizes(pending, rules_tokens + 2 * self._single_prompt_tokens()), [2, 2, 1])
+
+    def test_oversized_user_still_gets_own_group(self):
+        pending = [self._ctx(i) for i in range(3)]
+        self.assertEqual(self._group_sizes(pending, 1), [1, 1, 1])
+
+    def test_grouped_prompt_holds_users_in_order(self):
+        with mock.patch.object(recommendation, "_count_prompt_tokens", side_effect=len):
+            (group, prompt), = recommendation._group_users_for_gpt([self._ctx(3), self._ctx(4)])
+        payload = safe_parse_json(prompt)
+        self.assertEqual([user["user_id"] for user in payload["users"]], [3, 4])
@@ -20,7 +20,7 @@ from .serializers import (
     RawScholarshipSerializer,
 )
 from userinfor.models import UserScholarship
-from .recommendation import recommend
+from .recommendation import recommend, get_stored_recommendations
 
 import re
 from urllib.parse import urlparse
@@ -335,7 +335,8 @@ def get_recommended_scholarships_api(request):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        rec = recommend(request.user.id)
+        # Batch로 미리 계산해 둔 최신 추천이 있으면 그대로 쓰고, 없을 때만 실시간으로 추천합니다.
+        rec = get_stored_recommendations(request.user.id) or recommend(request.user.id, user_profile=user_profile)
 
         # (1) 추천 결과가 product_id들의 리스트/이터러블인 경우
         try: